@@ -0,0 +1,272 @@
+"""Сколько соединений выдерживает WSGI и ASGI при одном числе потоков.
+
+Сервер запускается в отдельном процессе в одном из режимов:
+
+    wsgi — сервер разработки Django, каждое соединение занимает поток
+           из пула в --threads потоков на всё время жизни, как
+           синхронные воркеры gunicorn;
+    asgi — минимальный HTTP/1.1-сервер на asyncio с yatube.asgi
+           (core.asgi.ASGIHandler) и тем же пулом для представлений.
+
+Клиент открывает --idle соединений без запроса в работе (как keep-alive
+между запросами), затем --clients клиентов делают по --requests запросов
+главной страницы. Для каждого режима выводится, сколько запросов
+успело выполниться за --timeout секунд, и задержка p50/p95. --delay
+добавляет к каждому запросу паузу, как ожидание блокировки SQLite.
+
+    python benchmarks/asgi_concurrency.py --idle 500 --threads 16
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socketserver
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'yatube'))
+
+MODES = ('wsgi', 'asgi')
+
+
+def setup_django(directory):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ.setdefault('DJANGO_ENV', 'test')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = os.path.join(
+        directory, 'db.sqlite3')
+    for config in settings.CACHES.values():
+        config['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+    import django
+    django.setup()
+
+
+def prepare(directory, posts):
+    setup_django(directory)
+    from django.core.management import call_command
+    from posts.models import Post, User
+    call_command('migrate', verbosity=0)
+    author = User.objects.create_user(username='author')
+    Post.objects.bulk_create(
+        Post(text=f'Пост {i}', author=author) for i in range(posts))
+
+
+def delayed(application, delay):
+    def wrapper(environ, start_response):
+        if delay:
+            time.sleep(delay)
+        return application(environ, start_response)
+    return wrapper
+
+
+def serve_wsgi(application, threads, port_queue):
+    from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class PooledWSGIServer(WSGIServer):
+        """Соединение обрабатывается в потоке пула целиком, со всеми
+        запросами keep-alive."""
+        request_queue_size = 4096
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread,
+                             request, client_address)
+
+        process_request_thread = (
+            socketserver.ThreadingMixIn.process_request_thread)
+
+    server = PooledWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(application)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+async def handle_http(application, reader, writer):
+    """Запросы одного соединения HTTP/1.1 по очереди: ровно столько
+    протокола, сколько нужно для замера."""
+    try:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, *header_lines = head.decode(
+                'latin-1').rstrip('\r\n').split('\r\n')
+            method, target, version = request_line.split(' ')
+            headers = [line.split(':', 1) for line in header_lines]
+            headers = [(name.strip().lower().encode('latin-1'),
+                        value.strip().encode('latin-1'))
+                       for name, value in headers]
+            length = int(dict(headers).get(b'content-length', 0))
+            body = await reader.readexactly(length)
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http', 'http_version': version[5:],
+                'method': method, 'path': path, 'root_path': '',
+                'query_string': query.encode('latin-1'),
+                'headers': headers, 'scheme': 'http',
+                'server': writer.get_extra_info('sockname')[:2],
+                'client': writer.get_extra_info('peername')[:2],
+            }
+            messages = [{'type': 'http.request', 'body': body}]
+            response = {'body': []}
+
+            async def receive():
+                return messages.pop() if messages else {
+                    'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response.update(message)
+                else:
+                    response['body'].append(message.get('body', b''))
+
+            await application(scope, receive, send)
+            content = b''.join(response['body'])
+            status = HTTPStatus(response['status'])
+            lines = [f'HTTP/1.1 {status.value} {status.phrase}'] + [
+                f'{name.decode("latin-1")}: {value.decode("latin-1")}'
+                for name, value in response['headers']
+                if name != b'content-length'
+            ] + [f'Content-Length: {len(content)}']
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode(
+                'latin-1') + content)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def serve_asgi(application, threads, port_queue):
+    from core.asgi import ASGIHandler
+
+    handler = ASGIHandler(application, max_workers=threads)
+
+    async def main():
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_http(handler, reader, writer),
+            '127.0.0.1', 0, backlog=4096)
+        port_queue.put(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def run_server(mode, directory, args, port_queue):
+    setup_django(directory)
+    from django.core.wsgi import get_wsgi_application
+    application = delayed(get_wsgi_application(), args.delay)
+    serve = serve_wsgi if mode == 'wsgi' else serve_asgi
+    serve(application, args.threads, port_queue)
+
+
+async def request(reader, writer):
+    writer.write(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    headers = dict(
+        line.split(':', 1) for line in head.split('\r\n')[1:] if line)
+    headers = {name.lower(): value.strip() for name, value in headers.items()}
+    await reader.readexactly(int(headers['content-length']))
+    return int(head.split(' ', 2)[1]), headers.get('connection') == 'close'
+
+
+async def client(port, args, timings, errors):
+    connection = None
+    for _ in range(args.requests):
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            started = time.perf_counter()
+            status, close = await request(*connection)
+            timings.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+            if close:
+                connection[1].close()
+                connection = None
+        except (OSError, asyncio.IncompleteReadError) as error:
+            errors.append(type(error).__name__)
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def load(port, args):
+    idle = [await asyncio.open_connection('127.0.0.1', port)
+            for _ in range(args.idle)]
+    timings, errors = [], []
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(client(port, args, timings, errors))
+             for _ in range(args.clients)]
+    done, pending = await asyncio.wait(tasks, timeout=args.timeout)
+    for task in pending:
+        task.cancel()
+    elapsed = time.perf_counter() - started
+    for _, writer in idle:
+        writer.close()
+    return timings, errors, elapsed
+
+
+def measure(mode, directory, args):
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=run_server, args=(mode, directory, args, port_queue),
+        daemon=True)
+    server.start()
+    try:
+        port = port_queue.get(timeout=60)
+        timings, errors, elapsed = asyncio.run(load(port, args))
+    finally:
+        server.terminate()
+        server.join()
+    total = args.clients * args.requests
+    timings_ms = sorted(value * 1000 for value in timings)
+    return {
+        'mode': mode,
+        'idle_connections': args.idle,
+        'threads': args.threads,
+        'completed': len(timings),
+        'of': total,
+        'errors': len(errors),
+        'seconds': round(elapsed, 2),
+        'p50_ms': round(statistics.median(timings_ms), 1)
+        if timings_ms else None,
+        'p95_ms': round(timings_ms[int(0.95 * (len(timings_ms) - 1))], 1)
+        if timings_ms else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--idle', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.02)
+    parser.add_argument('--timeout', type=float, default=20)
+    parser.add_argument('--posts', type=int, default=100)
+    parser.add_argument('--modes', nargs='+', default=list(MODES))
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        process = multiprocessing.Process(
+            target=prepare, args=(directory, args.posts))
+        process.start()
+        process.join()
+        results = [measure(mode, directory, args) for mode in args.modes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
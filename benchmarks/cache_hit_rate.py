@@ -0,0 +1,101 @@
+"""Доля попаданий в кеш при нескольких воркер-процессах.
+
+Запускает N процессов (как воркеры WSGI-сервера), каждый обрабатывает
+поток запросов к ключам с распределением Ципфа: при промахе «рендерит»
+значение и кладёт его в кеш. Сравниваются LocMemCache (свой кеш у
+каждого процесса), общий SQLiteCache и TieredCache (L1 + SQLite).
+
+    python benchmarks/cache_hit_rate.py --workers 4 --requests 5000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure()
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from core.cache import SQLiteCache, TieredCache  # noqa: E402
+
+BACKENDS = {
+    'locmem': LocMemCache,
+    'sqlite': SQLiteCache,
+    'tiered': TieredCache,
+}
+
+
+def make_cache(name, location):
+    params = {'KEY_PREFIX': 'bench', 'OPTIONS': {'MAX_ENTRIES': 100000}}
+    if name == 'tiered':
+        params['OPTIONS'].update(L1_TIMEOUT=5, L1_MAX_ENTRIES=500)
+    return BACKENDS[name](location, params)
+
+
+def worker(name, location, requests, keys, render_ms, seed, results):
+    cache = make_cache(name, location)
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    hits = 0
+    started = time.perf_counter()
+    for key in rng.choices(range(keys), weights, k=requests):
+        if cache.get(f'page:{key}') is None:
+            time.sleep(render_ms / 1000)
+            cache.set(f'page:{key}', 'x' * 2048, 300)
+        else:
+            hits += 1
+    results.put((hits, time.perf_counter() - started))
+
+
+def run(name, args):
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'cache.sqlite3')
+        if name == 'locmem':
+            location = 'bench'
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(
+                name, location, args.requests, args.keys, args.render_ms,
+                seed, results,
+            ))
+            for seed in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    hits = sum(hits for hits, _ in outcomes)
+    total = args.requests * args.workers
+    elapsed = max(seconds for _, seconds in outcomes)
+    return {
+        'backend': name,
+        'workers': args.workers,
+        'requests': total,
+        'hit_rate': round(hits / total, 4),
+        'requests_per_second': round(total / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--render-ms', type=float, default=1.0)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS))
+    args = parser.parse_args()
+    results = [run(name, args) for name in args.backends]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
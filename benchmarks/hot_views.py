@@ -0,0 +1,272 @@
+"""Задержка и число запросов к базе для каждого URL из posts/urls.py.
+
+Заполняет временную базу синтетическими данными через mixer
+(пользователи, группы, подписки, посты, комментарии), прогревает
+каждую страницу и измеряет p50/p95/p99 задержки и число SQL-запросов
+на запрос. Результат пишется в JSON (по умолчанию
+benchmarks/results/<commit>.json); с --compare прогон сравнивается с
+сохранённым, и при регрессии скрипт завершается с кодом 1.
+
+    python benchmarks/hot_views.py --posts 2000 --requests 50
+    python benchmarks/hot_views.py --compare benchmarks/results/abc123.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+os.environ.setdefault('DJANGO_ENV', 'dev')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from mixer.backend.django import mixer  # noqa: E402
+
+from posts import urls as posts_urls  # noqa: E402
+from posts.models import Comment, Follow, Group, Post, User  # noqa: E402
+
+
+class QueryCounter:
+    """Считает запросы через execute_wrapper: в отличие от
+    CaptureQueriesContext не форматирует SQL и не искажает время."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def seed(args, rng):
+    users = mixer.cycle(args.users).blend(
+        User, username=mixer.sequence('user{0}'))
+    groups = mixer.cycle(args.groups).blend(
+        Group, slug=mixer.sequence('group-{0}'))
+    pairs = set()
+    while len(pairs) < min(args.follows, args.users * (args.users - 1)):
+        user, author = rng.sample(users, 2)
+        pairs.add((user, author))
+    for user, author in pairs:
+        Follow.objects.create(user=user, author=author)
+    mixer.cycle(args.posts).blend(
+        Post,
+        author=(rng.choice(users) for _ in range(args.posts)),
+        group=(rng.choice(groups) for _ in range(args.posts)),
+        image='',
+    )
+    posts = list(Post.objects.only('pk'))
+    mixer.cycle(args.comments).blend(
+        Comment,
+        post=(rng.choice(posts) for _ in range(args.comments)),
+        author=(rng.choice(users) for _ in range(args.comments)),
+    )
+    reader = max(users, key=lambda user: user.follower.count())
+    return {
+        'users': users,
+        'groups': groups,
+        'posts': posts,
+        'reader': reader,
+        'rng': rng,
+    }
+
+
+def url(name, **kwargs):
+    return reverse(f'posts:{name}', kwargs=kwargs)
+
+
+def fresh_post(data):
+    return Post.objects.create(
+        text='Пост для удаления', author=data['reader'])
+
+
+def popular_post(data):
+    return data['rng'].choice(data['posts'])
+
+
+# name -> функция (данные набора) -> (метод, путь, тело запроса).
+# Подготовка внутри функции в замер не входит.
+SCENARIOS = {
+    'posts': lambda data: ('get', url('posts'), None),
+    'group_list': lambda data: (
+        'get', url('group_list', slug=data['rng'].choice(
+            data['groups']).slug), None),
+    'profile': lambda data: (
+        'get', url('profile', username=data['rng'].choice(
+            data['users']).username), None),
+    'post_detail': lambda data: (
+        'get', url('post_detail', post_id=popular_post(data).pk), None),
+    'post_create': lambda data: (
+        'post', url('post_create'), {'text': 'Новый пост'}),
+    'post_edit': lambda data: (
+        'post', url('post_edit', post_id=Post.objects.filter(
+            author=data['reader']).values_list('pk', flat=True).first()),
+        {'text': f'Изменённый пост {time.time()}'}),
+    'post_comments': lambda data: (
+        'get', url('post_comments', post_id=popular_post(data).pk), None),
+    'add_comment': lambda data: (
+        'post', url('add_comment', post_id=popular_post(data).pk),
+        {'text': 'Комментарий'}),
+    'follow_index': lambda data: ('get', url('follow_index'), None),
+    'post_search': lambda data: (
+        'get', url('post_search'), {'q': data['rng'].choice(
+            ('lorem', 'ipsum', 'dolor', 'sit', 'amet'))}),
+    'post_search_api': lambda data: (
+        'get', url('post_search_api'), {'q': 'lorem'}),
+    'profile_follow': lambda data: (
+        'get', url('profile_follow', username=data['rng'].choice(
+            data['users']).username), None),
+    'profile_unfollow': lambda data: (
+        'get', url('profile_unfollow', username=data['rng'].choice(
+            data['users']).username), None),
+    'post_delete': lambda data: (
+        'get', url('post_delete', username=data['reader'].username,
+                   post_id=fresh_post(data).pk), None),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def measure(client, scenario, data, args):
+    timings, queries, statuses = [], [], set()
+    for i in range(args.warmup + args.requests):
+        method, path, body = scenario(data)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = getattr(client, method)(path, body)
+            elapsed = time.perf_counter() - started
+        if i < args.warmup:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(counter.count)
+        statuses.add(response.status_code)
+    return {
+        'path': path,
+        'method': method.upper(),
+        'statuses': sorted(statuses),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries_median': statistics.median(queries),
+        'queries_max': max(queries),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение с baseline и возвращает список регрессий."""
+    regressions = []
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            continue
+        change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms']
+        print(f'{name:18} p95 {old["p95_ms"]:8.2f} -> '
+              f'{result["p95_ms"]:8.2f} ms ({change:+.0%}), queries '
+              f'{old["queries_max"]} -> {result["queries_max"]}')
+        if change > threshold:
+            regressions.append(f'{name}: p95 {change:+.0%}')
+        if result['queries_max'] > old['queries_max']:
+            regressions.append(f'{name}: queries {old["queries_max"]} -> '
+                               f'{result["queries_max"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--follows', type=int, default=1000)
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Допустимый рост p95 при сравнении (доля).')
+    args = parser.parse_args()
+
+    missing = {pattern.name for pattern in posts_urls.urlpatterns} - set(
+        SCENARIOS)
+    if missing:
+        parser.error(f'нет сценариев для URL: {", ".join(sorted(missing))}')
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        DEBUG=False,
+        MEDIA_ROOT=directory,
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        CACHES={
+            alias: {**config, 'LOCATION': os.path.join(
+                directory, 'cache.sqlite3')}
+            for alias, config in django.conf.settings.CACHES.items()
+        },
+    ):
+        connection.creation.create_test_db(verbosity=0)
+        started = time.perf_counter()
+        data = seed(args, random.Random(args.seed))
+        seeded = time.perf_counter() - started
+        client = Client()
+        client.force_login(data['reader'])
+        results = {
+            name: measure(client, scenario, data, args)
+            for name, scenario in SCENARIOS.items()
+        }
+    report = {
+        'commit': commit,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'dataset': {
+            name: getattr(args, name)
+            for name in ('users', 'groups', 'posts', 'follows', 'comments')
+        },
+        'seed_seconds': round(seeded, 2),
+        'requests': args.requests,
+        'results': results,
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f'Результаты: {output}')
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print('Регрессии:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
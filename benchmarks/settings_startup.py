@@ -0,0 +1,118 @@
+"""Время запуска и первых запросов для профилей настроек dev/test/prod.
+
+Каждый замер — отдельный процесс Python (как новый WSGI-воркер):
+импорт настроек и django.setup(), создание WSGI-приложения, первый
+запрос главной страницы (компиляция шаблонов) и медиана следующих
+запросов, где prod выигрывает за счёт кешированного загрузчика шаблонов
+и отсутствия debug_toolbar. База, кеш и статика — во временном
+каталоге; для prod статика собирается collectstatic в манифест.
+
+    python benchmarks/settings_startup.py --runs 5 --requests 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PROJECT = os.path.join(ROOT, 'yatube')
+PROFILES = ('dev', 'test', 'prod')
+# файлы, на которые ссылаются шаблоны через {% static %}
+STATIC_FILES = ('css/bootstrap.min.css', 'img/logo.png')
+
+# Код процесса-воркера. Пути к базе, кешу и статике подменяются до
+# django.setup(), чтобы не трогать файлы проекта.
+CHILD = '''
+import json, os, statistics, sys, time
+started = time.perf_counter()
+from django.conf import settings
+directory = os.environ['BENCH_DIR']
+settings.DATABASES['default']['NAME'] = os.path.join(directory, 'db.sqlite3')
+for config in settings.CACHES.values():
+    config['LOCATION'] = os.path.join(directory, 'cache.sqlite3')
+settings.STATICFILES_DIRS = (os.path.join(directory, 'static'),)
+settings.MEDIA_ROOT = os.path.join(directory, 'media')
+import django
+django.setup()
+if sys.argv[1] == 'prepare':
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    if os.environ['DJANGO_ENV'] == 'prod':
+        call_command('collectstatic', interactive=False, verbosity=0)
+    sys.exit()
+configured = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+get_wsgi_application()
+loaded = time.perf_counter()
+client = Client()
+assert client.get('/').status_code == 200
+first = time.perf_counter()
+warm = []
+for _ in range(int(sys.argv[2])):
+    request_started = time.perf_counter()
+    client.get('/')
+    warm.append(time.perf_counter() - request_started)
+print(json.dumps({
+    'setup_ms': (configured - started) * 1000,
+    'wsgi_ms': (loaded - configured) * 1000,
+    'first_request_ms': (first - loaded) * 1000,
+    'warm_request_ms': statistics.median(warm) * 1000,
+}))
+'''
+
+
+def child(profile, directory, *args):
+    env = {
+        **os.environ,
+        'DJANGO_ENV': profile,
+        'DJANGO_SETTINGS_MODULE': 'yatube.settings',
+        'DJANGO_SECRET_KEY': 'benchmark',
+        'DJANGO_STATIC_ROOT': os.path.join(directory, 'collected_static'),
+        'BENCH_DIR': directory,
+    }
+    started = time.perf_counter()
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, *args], cwd=PROJECT, env=env,
+        text=True)
+    return output, (time.perf_counter() - started) * 1000
+
+
+def measure(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        for name in STATIC_FILES:
+            path = os.path.join(directory, 'static', name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(b'placeholder')
+        child(profile, directory, 'prepare')
+        runs = []
+        for _ in range(args.runs):
+            output, process_ms = child(
+                profile, directory, 'run', str(args.requests))
+            runs.append({**json.loads(output), 'process_ms': process_ms})
+    return {
+        'profile': profile,
+        **{
+            name: round(statistics.median(run[name] for run in runs), 2)
+            for name in runs[0]
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES))
+    args = parser.parse_args()
+    print(json.dumps(
+        [measure(profile, args) for profile in args.profiles], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Пропускная способность чтения SQLite при одновременных писателях.
+
+Процессы-читатели выполняют запрос ленты (последние 10 постов автора),
+процессы-писатели — транзакции «прочитать пост, добавить комментарий,
+увеличить счётчик», как add_comment. Сравниваются настройки SQLite по
+умолчанию (журнал отката) и прагмы из core.db (WAL и др.) с повтором
+заблокированных транзакций.
+
+    python benchmarks/sqlite_concurrency.py --readers 4 --writers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'yatube'))
+
+from core.db import PRAGMAS  # noqa: E402
+
+MODES = ('default', 'tuned')
+AUTHORS = 50
+POSTS = 20000
+
+SCHEMA = '''
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL,
+    pub_date REAL NOT NULL,
+    text TEXT NOT NULL,
+    comments_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX post_author_pub_date_idx ON post (author_id, pub_date);
+CREATE TABLE comment (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+'''
+
+
+def connect(path, mode):
+    connection = sqlite3.connect(
+        path, timeout=20 if mode == 'tuned' else 5, isolation_level=None)
+    if mode == 'tuned':
+        for name, value in PRAGMAS.items():
+            connection.execute(f'PRAGMA {name}={value}')
+    return connection
+
+
+def prepare(path, mode):
+    connection = connect(path, mode)
+    connection.executescript(SCHEMA)
+    rng = random.Random(0)
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO post (author_id, pub_date, text) VALUES (?, ?, ?)',
+        ((rng.randrange(AUTHORS), i, 'x' * 200) for i in range(POSTS)),
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def reader(path, mode, deadline, seed, results):
+    connection = connect(path, mode)
+    rng = random.Random(seed)
+    reads = errors = 0
+    while time.time() < deadline:
+        try:
+            connection.execute(
+                'SELECT id, text FROM post WHERE author_id = ? '
+                'ORDER BY pub_date DESC LIMIT 10',
+                (rng.randrange(AUTHORS),),
+            ).fetchall()
+            reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', reads, errors))
+
+
+def write(connection, rng):
+    connection.execute('BEGIN')
+    try:
+        post_id, = connection.execute(
+            'SELECT id FROM post WHERE id = ?',
+            (rng.randrange(1, POSTS + 1),),
+        ).fetchone()
+        connection.execute(
+            'INSERT INTO comment (post_id, text) VALUES (?, ?)',
+            (post_id, 'x' * 100),
+        )
+        connection.execute(
+            'UPDATE post SET comments_count = comments_count + 1 '
+            'WHERE id = ?', (post_id,),
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def writer(path, mode, deadline, seed, results):
+    connection = connect(path, mode)
+    rng = random.Random(seed)
+    writes = errors = 0
+    while time.time() < deadline:
+        attempts = 5 if mode == 'tuned' else 1
+        for attempt in range(attempts):
+            try:
+                write(connection, rng)
+                writes += 1
+                break
+            except sqlite3.OperationalError:
+                if attempt == attempts - 1:
+                    errors += 1
+                else:
+                    time.sleep(0.005 * 2 ** attempt * rng.uniform(0.5, 1.5))
+    results.put(('write', writes, errors))
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'db.sqlite3')
+        prepare(path, mode)
+        results = multiprocessing.Queue()
+        deadline = time.time() + 1 + args.seconds
+        processes = [
+            multiprocessing.Process(
+                target=reader, args=(path, mode, deadline, seed, results))
+            for seed in range(args.readers)
+        ] + [
+            multiprocessing.Process(
+                target=writer, args=(path, mode, deadline, seed, results))
+            for seed in range(args.writers)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for kind, done, errors in outcomes:
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    # процессы стартуют в течение первой секунды, она тоже считается
+    seconds = args.seconds + 1
+    return {
+        'mode': mode,
+        'readers': args.readers,
+        'writers': args.writers,
+        'reads_per_second': round(totals['read'][0] / seconds, 1),
+        'writes_per_second': round(totals['write'][0] / seconds, 1),
+        'read_errors': totals['read'][1],
+        'failed_writes': totals['write'][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--modes', nargs='+', default=list(MODES))
+    args = parser.parse_args()
+    print(json.dumps([run(mode, args) for mode in args.modes], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Компактные представления объектов для JSON API."""
+
+
+def user_to_dict(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def post_to_dict(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'pub_date': post.pub_date.isoformat(),
+        'image': post.image.url if post.image else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def comment_to_dict(comment):
+    return {
+        'id': comment.pk,
+        'post': comment.post_id,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_to_dict(page_obj, serializer):
+    return {
+        'results': [serializer(obj) for obj in page_obj],
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    }
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    """JSON API лент, постов, комментариев и подписок"""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_feeds_are_paginated_by_cursor(self):
+        urls = (
+            reverse('api:posts'),
+            reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('api:author_posts', kwargs={'username': self.author}),
+        )
+        expected = [post.pk for post in reversed(self.posts)]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).json()
+                second = self.client.get(
+                    url, {'cursor': first['next']}).json()
+                self.assertIsNone(second['next'])
+                self.assertEqual(
+                    [post['id'] for post in first['results']
+                     + second['results']],
+                    expected)
+        post = first['results'][0]
+        self.assertEqual(post['author'], 'author')
+        self.assertEqual(post['group'], 'group')
+
+    def test_unchanged_feed_is_not_modified(self):
+        url = reverse('api:posts')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        with on_commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail_etag_changes_with_comments(self):
+        post = self.posts[0]
+        url = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        etag = self.client.get(url)['ETag']
+        with on_commit_callbacks():
+            response = self.client.post(
+                reverse('api:post_comments', kwargs={'post_id': post.pk}),
+                data={'text': 'Комментарий'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments_count'], 1)
+        comments = self.client.get(
+            reverse('api:post_comments', kwargs={'post_id': post.pk})).json()
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+
+    def test_post_detail_etag_changes_with_author_and_group(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.posts[0].pk})
+        etag = self.client.get(url)['ETag']
+        # объекты setUpTestData общие для всех тестов класса
+        author = User.objects.get(pk=self.author.pk)
+        group = Group.objects.get(pk=self.group.pk)
+        with on_commit_callbacks():
+            author.username = 'renamed'
+            author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['author'], 'renamed')
+        etag = response['ETag']
+        with on_commit_callbacks():
+            group.slug = 'renamed-group'
+            group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_require_login_and_valid_data(self):
+        url = reverse(
+            'api:post_comments', kwargs={'post_id': self.posts[0].pk})
+        self.assertEqual(
+            Client().post(url, {'text': 'Текст'}).status_code, 401)
+        response = self.client.post(url, {'text': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        for body in ('[]', '"Текст"', '{'):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_follow_and_unfollow(self):
+        url = reverse('api:follow', kwargs={'username': self.author})
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 200)
+        feed = self.client.get(reverse('api:follow_posts')).json()
+        self.assertEqual(len(feed['results']), 20)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+        feed = self.client.get(reverse('api:follow_posts')).json()
+        self.assertEqual(feed['results'], [])
+
+    def test_csrf_is_enforced(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        url = reverse('api:follow', kwargs={'username': self.author})
+        self.assertEqual(client.post(url).status_code, 403)
@@ -0,0 +1,27 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='posts'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path(
+        'users/<str:username>/posts/',
+        views.author_posts,
+        name='author_posts'
+    ),
+    path(
+        'users/<str:username>/follow/',
+        views.follow,
+        name='follow'
+    ),
+    path('follow/posts/', views.follow_posts, name='follow_posts'),
+]
@@ -0,0 +1,178 @@
+"""JSON API для мобильных клиентов.
+
+Ответы на чтение снабжены сильным ETag, построенным из версий тех же
+областей кеша, что и HTML-ленты (см. posts.caching): версия меняется
+при любом изменении содержимого, поэтому повторный запрос с
+If-None-Match к неизменившейся ленте получает 304 без тела и без
+запросов к постам. Пагинация курсорная (?cursor=).
+
+Запись — по сессии пользователя, с CSRF-токеном в X-CSRFToken.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET, require_http_methods
+
+from core.db import retry_on_locked
+from core.paginator import CursorPaginator
+from posts import caching, shards, timeline
+from posts.forms import CommentForm
+from posts.models import Follow, Group, Post, User
+
+from . import serializers
+
+PAGE_SIZE = 20
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def make_etag(request, scopes):
+    version = caching.get_version(*scopes)
+    digest = hashlib.sha1(
+        f'{version}:{request.get_full_path()}'.encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_json(request, scopes, build):
+    """JSON-ответ build() с ETag версий scopes или 304, если клиенту
+    уже известна эта версия."""
+    etag = make_etag(request, scopes)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build())
+        response['ETag'] = etag
+    return response
+
+
+def feed_response(request, post_list, *scopes):
+    paginator = CursorPaginator(post_list, PAGE_SIZE)
+    return conditional_json(request, scopes, lambda: serializers.page_to_dict(
+        paginator.get_page(request.GET.get('cursor')),
+        serializers.post_to_dict,
+    ))
+
+
+def request_data(request):
+    """Данные формы или JSON-объект тела запроса; None, если тело —
+    не JSON-объект."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+@require_GET
+def post_list(request):
+    return feed_response(
+        request, shards.merged(Post.objects.feed()), 'posts')
+
+
+@require_GET
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(
+        request, shards.merged(group.posts.feed()), f'group:{group.pk}')
+
+
+@require_GET
+def author_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(
+        request, shards.for_authors(Post.objects.feed(), [author.pk]),
+        f'author:{author.pk}')
+
+
+@require_GET
+@api_login_required
+def follow_posts(request):
+    pulled = timeline.pulled_authors(request.user.pk)
+    return feed_response(
+        request, timeline.get_feed(request.user, pulled),
+        f'follow:{request.user.pk}',
+        *(f'author:{author_id}' for author_id in pulled))
+
+
+@require_GET
+def post_detail(request, post_id):
+    post = shards.get_object_or_404(
+        Post.objects.only('author_id', 'group_id'), pk=post_id)
+    # в ответе есть имя автора и slug группы
+    scopes = [f'post:{post_id}', f'user:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+
+    def build():
+        return serializers.post_to_dict(shards.get_object_or_404(
+            Post.objects.feed(), pk=post_id))
+    return conditional_json(request, scopes, build)
+
+
+@require_http_methods(['GET', 'POST'])
+def post_comments(request, post_id):
+    post = shards.get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    if request.method == 'POST':
+        return add_comment(request, post)
+    paginator = CursorPaginator(
+        shards.merged(post.comments.select_related('author').only(
+            'text', 'created', 'post_id', 'author__username'),
+            [post._state.db]),
+        settings.COMMENTS_PER_PAGE,
+        ('created', 'id'),
+    )
+    return conditional_json(
+        request, [f'post:{post.pk}'], lambda: serializers.page_to_dict(
+            paginator.get_page(request.GET.get('cursor')),
+            serializers.comment_to_dict,
+        ))
+
+
+@api_login_required
+@retry_on_locked
+def add_comment(request, post):
+    data = request_data(request)
+    if data is None:
+        return JsonResponse(
+            {'detail': 'Тело запроса должно быть JSON-объектом.'},
+            status=400)
+    form = CommentForm(data)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    return JsonResponse(serializers.comment_to_dict(comment), status=201)
+
+
+@require_http_methods(['POST', 'DELETE'])
+@api_login_required
+@retry_on_locked
+def follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        Follow.objects.filter(user=request.user, author=author).delete()
+        return HttpResponse(status=204)
+    if author == request.user:
+        return JsonResponse(
+            {'detail': 'Нельзя подписаться на самого себя.'}, status=400)
+    _, created = Follow.objects.get_or_create(
+        user=request.user, author=author)
+    return JsonResponse(
+        serializers.user_to_dict(author), status=201 if created else 200)
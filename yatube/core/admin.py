@@ -1,3 +1,19 @@
+from django.contrib import admin
 
+from .models import Job
 
-# Register your models here.
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'status',
+        'attempts',
+        'run_at',
+        'created',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+
+
+admin.site.register(Job, JobAdmin)
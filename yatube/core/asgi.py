@@ -0,0 +1,150 @@
+"""ASGI-обёртка над WSGI-приложением Django.
+
+В Django 2.2 нет ни ASGIHandler, ни асинхронных представлений, поэтому
+ASGIHandler здесь переводит протокол сам (как asgiref.wsgi.WsgiToAsgi).
+Сетевую часть держит ASGI-сервер (uvicorn, daphne) на цикле событий:
+соединение в keep-alive между запросами и медленная загрузка тела
+запроса (картинки) не занимают поток. Поток из пула нужен только на
+время выполнения самого представления — ORM, шаблоны и ожидание
+блокировки SQLite идут в нём, вне цикла событий.
+
+    uvicorn yatube.asgi:application --workers 4
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# тело запроса в памяти до этого размера, дальше — во временном файле
+BODY_SPOOL_SIZE = 1024 * 1024
+
+
+class RequestAborted(Exception):
+    """Клиент отключился, не дослав тело запроса."""
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения: '
+                             f'{scope["type"]}')
+        try:
+            body = await self.read_body(receive)
+        except RequestAborted:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self.executor, self.run_wsgi,
+                self.environ(scope, body), send, loop)
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(BODY_SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise RequestAborted
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def environ(self, scope, body):
+        """WSGI environ по ASGI scope (PEP 3333: строки в latin-1)."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        script_name = scope.get('root_path', '')
+        path = scope['path']
+        if script_name and path.startswith(script_name):
+            path = path[len(script_name):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name.encode().decode('latin-1'),
+            'PATH_INFO': path.encode().decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                separator = '; ' if name == 'HTTP_COOKIE' else ','
+                value = environ[name] + separator + value
+            environ[name] = value
+        return environ
+
+    def run_wsgi(self, environ, send, loop):
+        """Выполняет WSGI-приложение в потоке пула и отдаёт ответ
+        по частям через send на цикле событий."""
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers
+                ],
+            }
+
+        def send_start():
+            if not response.get('started'):
+                response['started'] = True
+                send_sync(response['start'])
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    send_start()
+                    send_sync({'type': 'http.response.body', 'body': chunk,
+                               'more_body': True})
+            send_start()
+            send_sync({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
@@ -0,0 +1,351 @@
+"""Кеш, общий для всех процессов сервера.
+
+SQLiteCache хранит значения в файле SQLite (режим WAL), так что все
+WSGI-воркеры на одной машине видят один и тот же прогретый кеш вместо
+собственной копии LocMemCache в каждом. TieredCache ставит перед любым
+общим бэкендом небольшой LRU-кеш в памяти процесса: повторные чтения
+горячих ключей не ходят даже в SQLite, а устаревание данных в нём
+ограничено L1_TIMEOUT секундами.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+SQLITE_MAX_VARIABLES = 500
+
+
+def _chunks(items, size=SQLITE_MAX_VARIABLES):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в таблице SQLite. LOCATION — путь к файлу базы.
+
+    Разные пространства имён в одном файле разделяются KEY_PREFIX;
+    clear() удаляет только ключи своего префикса.
+    """
+    CULL_EVERY = 100
+    BUSY_TIMEOUT = 5
+    # диапазон по первичному ключу, в отличие от substr(), идёт по индексу
+    IN_NAMESPACE = 'key >= ? AND key < ?'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # после fork соединение родителя использовать нельзя
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path,
+                timeout=self.BUSY_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _alive(self, expires):
+        return expires is None or expires > time.time()
+
+    def _dump(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def get(self, key, default=None, version=None):
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),)
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        connection = self._connection()
+        for chunk in _chunks(keys):
+            rows = connection.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+                % ','.join('?' * len(chunk)),
+                chunk
+            )
+            for db_key, value, expires in rows:
+                if self._alive(expires):
+                    found[keys[db_key]] = pickle.loads(value)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
+
+    def has_key(self, key, version=None):
+        row = self._connection().execute(
+            'SELECT expires FROM cache WHERE key = ?',
+            (self._key(key, version),)
+        ).fetchone()
+        return row is not None and self._alive(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dump(value), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows
+            )
+        self._after_write(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time())
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dump(value), self.get_backend_timeout(timeout))
+            ).rowcount == 1
+        if added:
+            self._after_write(1)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout),
+             self._key(key, version), time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dump(value), key)
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                [(self._key(key, version),) for key in keys]
+            )
+
+    def _namespace(self):
+        """Границы ключей своего префикса для IN_NAMESPACE."""
+        prefix = '%s:' % self.key_prefix
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def clear(self):
+        self._connection().execute(
+            'DELETE FROM cache WHERE ' + self.IN_NAMESPACE, self._namespace()
+        )
+
+    def _after_write(self, count):
+        self._writes += count
+        if self._writes >= self.CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        namespace = self._namespace()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+            )
+            total = connection.execute(
+                'SELECT COUNT(*) FROM cache WHERE ' + self.IN_NAMESPACE,
+                namespace
+            ).fetchone()[0]
+            if total > self._max_entries:
+                # самые давно записанные строки: REPLACE выдаёт новый rowid
+                connection.execute(
+                    'DELETE FROM cache WHERE rowid IN ('
+                    'SELECT rowid FROM cache WHERE ' + self.IN_NAMESPACE
+                    + ' ORDER BY rowid LIMIT ?)',
+                    (*namespace, total // self._cull_frequency)
+                )
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кеш: LRU в памяти процесса (L1) перед общим
+    бэкендом (L2), который создаётся из OPTIONS['SHARED_BACKEND'] с тем же
+    LOCATION, KEY_PREFIX и остальными параметрами.
+
+    Значение живёт в L1 не дольше L1_TIMEOUT секунд, поэтому изменения из
+    других процессов становятся видны с такой задержкой. Ключи, которым
+    это недопустимо (например, версии лент), держите в отдельном алиасе
+    без L1.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('SHARED_BACKEND', 'core.cache.SQLiteCache')
+        self.l1_timeout = options.pop('L1_TIMEOUT', 5)
+        self.l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        params = {**params, 'OPTIONS': options}
+        super().__init__(params)
+        self.shared = import_string(backend)(location, params)
+        self.stats = Counter()
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _l1_get(self, key):
+        with self._lock:
+            item = self._l1.get(key)
+            if item is None:
+                return item
+            if item[1] <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return item
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        lifetime = self.l1_timeout
+        if timeout is not None:
+            lifetime = min(lifetime, timeout)
+        with self._lock:
+            if lifetime <= 0:
+                self._l1.pop(key, None)
+                return
+            self._l1[key] = (value, time.monotonic() + lifetime)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = {}
+        for key in keys:
+            item = self._l1_get(self.make_key(key, version))
+            if item is None:
+                missing[key] = self.make_key(key, version)
+            else:
+                found[key] = item[0]
+        self.stats['l1_hits'] += len(found)
+        # промахи L1 учтёт общий бэкенд
+        metrics.record_cache(len(found), 0)
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            self.stats['l2_hits'] += len(shared)
+            self.stats['misses'] += len(missing) - len(shared)
+            for key, value in shared.items():
+                self._l1_set(missing[key], value)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        if self._l1_get(self.make_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._l1_set(self.make_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            self._l1_set(self.make_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._l1_set(self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_key(key, version))
+        return self.shared.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(self.make_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._l1_delete(*(self.make_key(key, version) for key in keys))
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,92 @@
+"""Настройка SQLite для работы под нагрузкой.
+
+При открытии соединения включаются WAL (читатели не ждут писателя),
+synchronous=NORMAL (в WAL безопасно и без fsync на каждый коммит),
+отображение файла в память и увеличенный кеш страниц. Соединения
+живут CONN_MAX_AGE секунд, поэтому прагмы выполняются один раз на
+соединение, а не на каждый запрос.
+
+Писатель в SQLite всегда один. Транзакция, начавшаяся с чтения, при
+конкурирующей записи получает «database is locked» сразу, не дожидаясь
+busy timeout, поэтому изменения оборачиваются в retry_on_locked:
+транзакция повторяется целиком с экспоненциальной паузой. Если посты
+разнесены по шардам (POST_SHARDS), транзакции открываются и в них:
+иначе повтор оставил бы строки первой попытки в шарде.
+"""
+import functools
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import (DEFAULT_DB_ALIAS, OperationalError, connections,
+                       transaction)
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: прагмы для нового соединения."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+
+def is_locked(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def write_aliases():
+    """Базы, в которые пишут представления. default — последней: её
+    транзакция коммитится первой, и ключи из Sequence не выдаются
+    повторно, даже если коммит шарда не удастся."""
+    shards = [alias for alias in settings.POST_SHARDS
+              if alias != DEFAULT_DB_ALIAS]
+    return [*shards, DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def atomic_writes():
+    """Транзакции во всех базах записи (write_aliases)."""
+    with ExitStack() as stack:
+        for alias in write_aliases():
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def retry_on_locked(func=None, *, attempts=None, delay=None):
+    """Выполняет func в транзакции и повторяет её при блокировке базы.
+
+    Внутри чужой транзакции повторять нечего — её откатит и повторит
+    внешний код, поэтому там func вызывается как есть."""
+    if func is None:
+        return functools.partial(
+            retry_on_locked, attempts=attempts, delay=delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if any(connections[alias].in_atomic_block
+               for alias in write_aliases()):
+            return func(*args, **kwargs)
+        tries = attempts or settings.SQLITE_LOCK_RETRIES
+        pause = delay if delay is not None else (
+            settings.SQLITE_LOCK_RETRY_DELAY)
+        for attempt in range(tries):
+            try:
+                with atomic_writes():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if not is_locked(error) or attempt == tries - 1:
+                    raise
+            time.sleep(pause * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
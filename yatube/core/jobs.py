@@ -0,0 +1,175 @@
+"""Очередь фоновых задач в базе SQLite.
+
+Побочные эффекты записи (миниатюры, разнос постов по лентам, сброс кеша
+лент подписчиков, письма) не выполняются в запросе: enqueue() добавляет
+строку Job в той же транзакции, что и сами данные, а воркеры
+(manage.py run_workers) забирают задачи и выполняют их.
+
+Задача — функция, отмеченная декоратором @task; параметры передаются
+именованными аргументами и хранятся в JSON. Упавшая задача повторяется
+с растущей паузой, после max_attempts попыток остаётся в статусе failed.
+Попыткой считается и взятая задача, воркер которой упал: задача,
+роняющая воркер (например, по памяти), не берётся бесконечно.
+По ключу идемпотентности (key) в очереди не бывает двух одинаковых
+ожидающих задач: повторный enqueue с тем же ключом ничего не добавит.
+Задачи должны быть идемпотентны: после сбоя воркера взятая задача
+выполнится ещё раз.
+
+При JOBS_EAGER (разработка, тесты) задача выполняется сразу в enqueue().
+"""
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+def task(func=None, *, max_attempts=None):
+    """Регистрирует функцию как задачу очереди под именем
+    <модуль>.<функция>."""
+    def register(func):
+        func.job_name = f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        _tasks[func.job_name] = func
+        return func
+    return register(func) if func else register
+
+
+def enqueue(func, key=None, delay=0, **payload):
+    """Ставит задачу func в очередь, через delay секунд."""
+    if settings.JOBS_EAGER:
+        func(**payload)
+        return
+    job = Job(
+        name=func.job_name,
+        payload=json.dumps(payload),
+        key=key,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    # строки с тем же key не добавятся: ограничение уникальности
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+
+
+def claim(limit=1):
+    """Забирает готовые к выполнению задачи. Задачи, зависшие в работе
+    дольше JOBS_LOCK_TIMEOUT (воркер упал), забираются снова, а
+    исчерпавшие попытки — помечаются как failed."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    ready = (
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=stale)
+    )
+    candidates = list(Job.objects.filter(ready).order_by(
+        'run_at', 'pk').values_list('pk', flat=True)[:limit])
+    claimed = []
+    # Без общей транзакции: в SQLite чтение с последующей записью в одной
+    # транзакции сразу падает с «database is locked», если другой воркер
+    # успел записать. Каждый UPDATE — отдельная запись, она ждёт
+    # блокировку, а условие ready не даёт взять задачу дважды.
+    for pk in candidates:
+        # ключ освобождается: новое событие во время выполнения
+        # снова поставит задачу в очередь
+        if Job.objects.filter(ready, pk=pk).update(
+                status=Job.RUNNING, key=None, locked_at=now,
+                attempts=F('attempts') + 1):
+            claimed.append(pk)
+    jobs = []
+    for job in Job.objects.filter(pk__in=claimed).order_by('run_at', 'pk'):
+        max_attempts = getattr(_tasks.get(job.name), 'max_attempts', 1)
+        if job.attempts > max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None,
+                last_error='Воркер не завершил задачу за JOBS_LOCK_TIMEOUT')
+            logger.error('Задача %s не выполнена: воркер не вернулся', job)
+            continue
+        jobs.append(job)
+    return jobs
+
+
+def run(job):
+    """Выполняет задачу: удаляет её при успехе, при ошибке откладывает
+    повтор или помечает как failed. Возвращает True при успехе."""
+    func = _tasks.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        func(**json.loads(job.payload))
+    except Exception:
+        error = traceback.format_exc()
+        max_attempts = getattr(func, 'max_attempts', 1)
+        if job.attempts < max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, last_error=error, locked_at=None,
+                run_at=timezone.now() + timedelta(seconds=delay))
+            logger.warning('Задача %s упала, попытка %d из %d',
+                           job, job.attempts, max_attempts)
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error, locked_at=None)
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(stop=None):
+    """Выполняет готовые задачи, пока они есть (или до stop).
+    Возвращает число выполненных попыток."""
+    done = 0
+    while stop is None or not stop.is_set():
+        jobs = claim()
+        if not jobs:
+            break
+        for job in jobs:
+            started = time.perf_counter()
+            ok = run(job)
+            logger.info('%s %s за %.3f с', job, 'выполнена' if ok else
+                        'упала', time.perf_counter() - started)
+            done += 1
+    return done
+
+
+def work(stop, burst=False):
+    """Цикл воркера: выполняет задачи, пока не установлен stop
+    (threading.Event); при burst — пока очередь не опустеет."""
+    done = 0
+    while not stop.is_set():
+        close_old_connections()
+        done += run_pending(stop)
+        if burst:
+            break
+        stop.wait(settings.JOBS_POLL_INTERVAL)
+    close_old_connections()
+    return done
+
+
+def depth():
+    """Число задач по имени и статусу: {(name, status): count}."""
+    rows = Job.objects.values('name', 'status').annotate(
+        count=Count('pk')).order_by()
+    return {(row['name'], row['status']): row['count'] for row in rows}
+
+
+def _collect_depth():
+    return {
+        (('name', name), ('status', status)): count
+        for (name, status), count in depth().items()
+    }
+
+
+metrics.registry.add(metrics.Gauge(
+    'yatube_jobs', 'Задачи в очереди по статусу.', _collect_depth))
@@ -0,0 +1,46 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи фоновой очереди (core.jobs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда очередь опустеет.',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # текущие задачи доделываются, новые не берутся
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        done = []
+        workers = [
+            threading.Thread(
+                target=lambda: done.append(jobs.work(stop, options['burst'])),
+                name=f'jobs-{number}',
+            )
+            for number in range(options['threads'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {sum(done)}'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик '
+            '(DATABASE_REPLICAS) для локальной проверки чтения с реплик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Повторять копирование каждые столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены (DATABASE_REPLICAS).')
+        while True:
+            synced = replicas.sync()
+            self.stdout.write(self.style.SUCCESS(
+                f'Обновлены реплики: {", ".join(synced) or "нет"}'
+            ))
+            if not options['interval']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,207 @@
+"""Лёгкие метрики запросов в памяти процесса.
+
+MetricsMiddleware заводит на время запроса RequestMetrics в
+thread-local; SQL-запросы считает execute_wrapper, обращения к кешу —
+бэкенды core.cache, время шаблонов — InstrumentedDjangoTemplates.
+По завершении запроса значения попадают в гистограммы по имени
+представления, которые отдаются в текстовом формате Prometheus.
+
+Метрики у каждого процесса свои: Prometheus опрашивает воркеры
+по отдельности или суммирует их.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Показатели одного запроса."""
+
+    def __init__(self, keep_statements=0):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.render_depth = 0
+        self.keep_statements = keep_statements
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: время и текст SQL-запросов."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            # куча самых долгих запросов для журнала медленных
+            if len(self.statements) < self.keep_statements:
+                heapq.heappush(self.statements, (duration, sql))
+            elif self.keep_statements:
+                heapq.heappushpop(self.statements, (duration, sql))
+
+
+def start(keep_statements=0):
+    _local.request = RequestMetrics(keep_statements)
+    return _local.request
+
+
+def stop():
+    _local.request = None
+
+
+def current():
+    return getattr(_local, 'request', None)
+
+
+def record_cache(hits, misses):
+    request = current()
+    if request is not None:
+        request.cache_hits += hits
+        request.cache_misses += misses
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = defaultdict(
+            lambda: [[0] * (len(buckets) + 1), 0.0, 0])
+
+    def observe(self, labels, value):
+        counts, _, _ = series = self.series[labels]
+        counts[bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} histogram'
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = _labels(labels)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield (f'{self.name}_bucket{{{label_text},le="{bound}"}} '
+                       f'{cumulative}')
+            yield f'{self.name}_sum{{{label_text}}} {total}'
+            yield f'{self.name}_count{{{label_text}}} {count}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = defaultdict(int)
+
+    def inc(self, labels, value=1):
+        self.series[labels] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in sorted(self.series.items()):
+            yield f'{self.name}{{{_labels(labels)}}} {value}'
+
+
+class Gauge:
+    """Текущее значение, которое считается при выдаче метрик:
+    collect() возвращает {метки: значение}."""
+
+    def __init__(self, name, help_text, collect):
+        self.name = name
+        self.help_text = help_text
+        self.collect = collect
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help_text}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in sorted(self.collect().items()):
+            yield f'{self.name}{{{_labels(labels)}}} {value}'
+
+
+def _labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"'))
+        for name, value in labels
+    )
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram(
+            'yatube_request_duration_seconds',
+            'Время обработки запроса.', SECONDS_BUCKETS)
+        self.db_queries = Histogram(
+            'yatube_request_db_queries',
+            'SQL-запросов на запрос.', QUERIES_BUCKETS)
+        self.db_duration = Histogram(
+            'yatube_request_db_duration_seconds',
+            'Время SQL-запросов за запрос.', SECONDS_BUCKETS)
+        self.template_duration = Histogram(
+            'yatube_request_template_duration_seconds',
+            'Время рендеринга шаблонов за запрос.', SECONDS_BUCKETS)
+        self.cache = Counter(
+            'yatube_cache_lookups_total',
+            'Обращения к кешу по результату.')
+        self.responses = Counter(
+            'yatube_responses_total', 'Ответы по коду статуса.')
+        self.image_bytes = Counter(
+            'yatube_image_bytes_total',
+            'Размер картинок постов до и после нормализации.')
+        self.metrics = [
+            self.duration, self.db_queries, self.db_duration,
+            self.template_duration, self.cache, self.responses,
+            self.image_bytes,
+        ]
+
+    def observe(self, view, method, status, duration, request):
+        labels = (('view', view), ('method', method))
+        with self.lock:
+            self.duration.observe(labels, duration)
+            self.db_queries.observe(labels, request.queries)
+            self.db_duration.observe(labels, request.db_time)
+            self.template_duration.observe(labels, request.template_time)
+            self.cache.inc(
+                (('view', view), ('result', 'hit')), request.cache_hits)
+            self.cache.inc(
+                (('view', view), ('result', 'miss')), request.cache_misses)
+            self.responses.inc((('view', view), ('status', status)))
+
+    def add(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+
+    def record_image(self, original_size, stored_size):
+        with self.lock:
+            self.image_bytes.inc((('stage', 'original'),), original_size)
+            self.image_bytes.inc((('stage', 'stored'),), stored_size)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+            lines = [line for metric in metrics
+                     if not isinstance(metric, Gauge)
+                     for line in metric.render()]
+        # датчики могут ходить в базу, запросы ждать их не должны
+        lines += [line for metric in metrics if isinstance(metric, Gauge)
+                  for line in metric.render()]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
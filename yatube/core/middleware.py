@@ -0,0 +1,51 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger('yatube.slow_requests')
+
+
+class MetricsMiddleware:
+    """Собирает метрики каждого запроса (см. core.metrics) и пишет в лог
+    медленные запросы вместе с их самыми долгими SQL-запросами."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start(settings.SLOW_REQUEST_MAX_STATEMENTS)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        duration = time.perf_counter() - request_metrics.started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.registry.observe(
+            view, request.method, response.status_code, duration,
+            request_metrics)
+        if duration >= settings.SLOW_REQUEST_THRESHOLD:
+            self.log_slow(request, view, duration, request_metrics)
+        return response
+
+    def log_slow(self, request, view, duration, request_metrics):
+        statements = sorted(request_metrics.statements, reverse=True)
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.3f с, SQL: %d за %.3f с, '
+            'шаблоны: %.3f с, кеш: %d попаданий, %d промахов\n%s',
+            request.method, request.get_full_path(), view, duration,
+            request_metrics.queries, request_metrics.db_time,
+            request_metrics.template_time, request_metrics.cache_hits,
+            request_metrics.cache_misses,
+            '\n'.join(f'  {seconds * 1000:.1f} мс  {sql}'
+                      for seconds, sql in statements),
+        )
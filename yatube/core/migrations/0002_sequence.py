@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Имя')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Последний выданный ключ')),
+            ],
+        ),
+    ]
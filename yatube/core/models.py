@@ -11,3 +11,47 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Job(models.Model):
+    """Отложенная задача очереди core.jobs."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    payload = models.TextField('Параметры (JSON)', default='{}')
+    # ключ идемпотентности: пока задача ждёт в очереди, такая же
+    # не добавляется
+    key = models.CharField(
+        'Ключ', max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить после')
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+
+class Sequence(models.Model):
+    """Счётчик ключей, общих для нескольких баз (см. posts.shards)."""
+    name = models.CharField('Имя', max_length=100, unique=True)
+    value = models.BigIntegerField('Последний выданный ключ', default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class CountedPaginator(Paginator):
+    """Paginator, которому число объектов передано готовым (например,
+    из денормализованного счётчика) вместо COUNT(*) по object_list."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        return self.known_count
+
+
+class CursorPage:
+    """Страница курсорной пагинации. Повторяет интерфейс
+    django.core.paginator.Page, насколько это возможно без общего числа
+    объектов: номеров страниц и счётчика у неё нет.
+
+    Как и обычная страница, к базе обращается только при первом доступе
+    к объектам, поэтому закешированный в шаблоне фрагмент запросов
+    не делает."""
+
+    def __init__(self, paginator, direction, values):
+        self.paginator = paginator
+        self.direction = direction
+        self.values = values
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    @cached_property
+    def _window(self):
+        return self.paginator.fetch(self.direction, self.values)
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    @property
+    def next_cursor(self):
+        return self._window[1]
+
+    @property
+    def previous_cursor(self):
+        return self._window[2]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по набору полей сортировки.
+
+    Страница выбирается условием вида (pub_date, id) < (x, y) вместо
+    OFFSET, поэтому глубокие страницы не медленнее первой, COUNT(*) не
+    нужен, а новые записи, появившиеся между запросами, не сдвигают
+    уже показанные. Последнее поле сортировки должно быть уникальным.
+    """
+    is_cursor = True
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору. Пустой или испорченный курсор
+        означает первую страницу."""
+        return CursorPage(self, *self.decode_cursor(cursor))
+
+    def fetch(self, direction, values):
+        """Объекты страницы и курсоры соседних страниц."""
+        if direction == self.PREVIOUS:
+            queryset = self.object_list.filter(self.keyset_filter(
+                values, forward=False
+            )).order_by(*self.reversed_ordering())
+            objects = list(queryset[:self.per_page + 1])
+            has_previous = len(objects) > self.per_page
+            objects = objects[:self.per_page][::-1]
+            has_next = True
+        else:
+            queryset = self.object_list.order_by(*self.ordering)
+            if direction == self.NEXT:
+                queryset = queryset.filter(self.keyset_filter(values))
+            objects = list(queryset[:self.per_page + 1])
+            has_next = len(objects) > self.per_page
+            objects = objects[:self.per_page]
+            has_previous = direction == self.NEXT
+        next_cursor = previous_cursor = None
+        if objects and has_next:
+            next_cursor = self.encode_cursor(self.NEXT, objects[-1])
+        if objects and has_previous:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, objects[0])
+        return objects, next_cursor, previous_cursor
+
+    def reversed_ordering(self):
+        return tuple(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        )
+
+    def keyset_filter(self, values, forward=True):
+        """Строит условие «строго после» (или «строго до») позиции values
+        в порядке self.ordering:
+        (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
+
+    def encode_cursor(self, direction, obj):
+        values = [self.value_to_string(name, obj) for name in self.fields]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None, None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            if (direction not in (self.NEXT, self.PREVIOUS)
+                    or len(raw_values) != len(self.fields)):
+                return None, None
+            values = [
+                self.field(name).to_python(value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None, None
+        return direction, values
+
+    def field(self, name):
+        """Поле модели или поле результата аннотации (например, ранга
+        поиска) с этим именем."""
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def value_to_string(self, name, obj):
+        if name in self.object_list.query.annotations:
+            return str(getattr(obj, name))
+        return self.field(name).value_to_string(obj)
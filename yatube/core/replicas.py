@@ -0,0 +1,142 @@
+"""Чтение с реплик базы.
+
+Представления только для чтения (ленты, профиль, страница поста)
+отмечены @read_only: их запросы идут в одну из баз DATABASE_REPLICAS,
+всё остальное и любые записи — в основную базу default. Без реплик в
+настройках ReplicaRouter ничего не меняет.
+
+Реплика отстаёт от основной базы, поэтому запрос, который что-то
+записал (пост, комментарий, подписка, регистрация), на
+REPLICA_STICKY_SECONDS «привязывает» сессию к основной базе
+(ReplicaMiddleware): автор сразу видит свою запись. Сессии всегда
+читаются из основной базы — по ним и проверяется привязка.
+
+Версии кеша лент меняются сразу после коммита в основную базу, а
+реплика получает запись только со следующей синхронизацией. Страница,
+собранная с реплики, кешируется ещё и под версией этой реплики: после
+синхронизации sync() отправляет сигнал synced, версия меняется, и
+собранное с отставшей копии перестаёт находиться.
+
+Локально реплика — копия файла SQLite, которую обновляет
+manage.py sync_replicas (онлайн-копирование sqlite3 backup API).
+"""
+import functools
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.db import connections
+from django.dispatch import Signal
+
+PRIMARY = 'default'
+SESSION_KEY = '_primary_until'
+# приложения, которые читаются только из основной базы
+PRIMARY_APPS = {'sessions'}
+
+_local = threading.local()
+
+# реплика alias получила свежую копию основной базы
+synced = Signal(providing_args=['alias'])
+
+
+def current():
+    """Реплика, из которой читает текущий запрос, или None."""
+    return getattr(_local, 'replica', None)
+
+
+def is_pinned(request):
+    """Привязана ли сессия к основной базе после недавней записи."""
+    session = getattr(request, 'session', None)
+    return bool(session) and session.get(SESSION_KEY, 0) > time.time()
+
+
+def read_only(view):
+    """Декоратор представления: чтение из случайной реплики, если сессия
+    не привязана к основной базе."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or is_pinned(request):
+            return view(request, *args, **kwargs)
+        # одна реплика на весь запрос: страница собирается из одного
+        # согласованного состояния
+        _local.replica = random.choice(replicas)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = None
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = current()
+        if replica and model._meta.app_label not in PRIMARY_APPS:
+            return replica
+        return None
+
+    def db_for_write(self, model, instance=None, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            _local.wrote = True
+        # прочитанное с реплики записывается в основную базу, объекты
+        # других баз (например, при migrate --database) — в свою
+        db = instance._state.db if instance is not None else None
+        if db is None or db in settings.DATABASE_REPLICAS:
+            return PRIMARY
+        return db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии основной базы, связи между ними допустимы
+        aliases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # схема реплик приходит вместе с данными основной базы
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Привязывает сессию к основной базе после запроса с записью.
+    Стоит после SessionMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = False
+        response = self.get_response(request)
+        if (_local.wrote and settings.DATABASE_REPLICAS
+                and hasattr(request, 'session')):
+            request.session[SESSION_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+def copy_sqlite(source, target):
+    """Копирует базу SQLite source в файл target постранично, не
+    останавливая запись в source."""
+    with closing(sqlite3.connect(source)) as src, \
+            closing(sqlite3.connect(target)) as dst:
+        src.backup(dst)
+
+
+def sync():
+    """Обновляет реплики SQLite копией основной базы. Возвращает
+    алиасы обновлённых реплик."""
+    source = connections[PRIMARY].settings_dict['NAME']
+    updated = []
+    for alias in settings.DATABASE_REPLICAS:
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        copy_sqlite(source, connection.settings_dict['NAME'])
+        synced.send(sender=sync, alias=alias)
+        updated.append(alias)
+    return updated
@@ -0,0 +1,34 @@
+"""Бэкенд шаблонов Django, засекающий время рендеринга для метрик."""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        request_metrics = metrics.current()
+        if request_metrics is None:
+            return super().render(context, request)
+        # вложенный render_to_string (карточки постов) уже входит
+        # во время внешнего шаблона
+        request_metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            request_metrics.render_depth -= 1
+            if not request_metrics.render_depth:
+                request_metrics.template_time += (
+                    time.perf_counter() - started)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
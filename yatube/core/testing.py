@@ -0,0 +1,19 @@
+"""Помощники тестов."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def on_commit_callbacks(using=DEFAULT_DB_ALIAS):
+    """Выполняет колбэки transaction.on_commit, добавленные внутри блока.
+
+    Транзакция TestCase не коммитится, и без этого колбэки не выполнятся
+    никогда (в Django 3.2 то же делает captureOnCommitCallbacks)."""
+    connection = connections[using]
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
@@ -1,3 +1,509 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import timedelta
+from unittest import mock
 
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection, connections, router
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from posts import caching
+from posts.models import Post
+
+from . import jobs, metrics, replicas
+from .asgi import ASGIHandler
+from .cache import SQLiteCache, TieredCache
+from .db import retry_on_locked
+from .models import Job
+
+User = get_user_model()
+
+
+class SharedCacheTest(SimpleTestCase):
+    """Общий кеш в SQLite и L1-уровень перед ним"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, backend=SQLiteCache, prefix='test', **options):
+        return backend(self.location, {
+            'KEY_PREFIX': prefix,
+            'OPTIONS': options,
+        })
+
+    def test_values_are_shared_between_instances(self):
+        """Экземпляры (как воркеры разных процессов) видят общие данные"""
+        writer, reader = self.make_cache(), self.make_cache()
+        writer.set('key', {'value': 1})
+        writer.set_many({'a': 1, 'b': 2})
+        self.assertEqual(reader.get('key'), {'value': 1})
+        self.assertEqual(reader.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+        writer.delete('key')
+        self.assertIsNone(reader.get('key'))
+
+    def test_expiry_add_and_incr(self):
+        cache = self.make_cache()
+        cache.set('expired', 1, timeout=-1)
+        self.assertFalse(cache.has_key('expired'))
+        self.assertTrue(cache.add('expired', 2))
+        self.assertFalse(cache.add('expired', 3))
+        self.assertEqual(cache.incr('expired', 5), 7)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_clear_keeps_other_namespaces(self):
+        first = self.make_cache(prefix='first')
+        second = self.make_cache(prefix='second')
+        first.set('key', 'first')
+        second.set('key', 'second')
+        first.clear()
+        self.assertIsNone(first.get('key'))
+        self.assertEqual(second.get('key'), 'second')
+
+    def test_cull_limits_namespace_size(self):
+        cache = self.make_cache(MAX_ENTRIES=50, CULL_FREQUENCY=2)
+        for i in range(150):
+            cache.set(f'key{i}', i)
+        self.assertLessEqual(
+            len(cache.get_many([f'key{i}' for i in range(150)])), 100)
+        self.assertEqual(cache.get('key149'), 149)
+
+    def test_namespace_lookup_uses_primary_key(self):
+        """Очистка и вытеснение ищут ключи префикса по индексу"""
+        cache = self.make_cache()
+        cache.set('key', 1)
+        plan = cache._connection().execute(
+            'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM cache WHERE '
+            + SQLiteCache.IN_NAMESPACE, cache._namespace()
+        ).fetchall()
+        self.assertTrue(any('SEARCH' in row[-1] for row in plan), plan)
+        self.assertEqual(cache._namespace(), ('test:', 'test;'))
+
+    def test_tiered_cache_serves_hot_keys_from_l1(self):
+        cache = self.make_cache(TieredCache, L1_TIMEOUT=60)
+        other = self.make_cache(TieredCache, L1_TIMEOUT=60)
+        cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        self.assertEqual(other.get('key'), 'value')
+        self.assertEqual(other.stats['l2_hits'], 1)
+        self.assertEqual(other.stats['l1_hits'], 1)
+        other.delete('key')
+        self.assertIsNone(other.get('key'))
+        self.assertIsNone(self.make_cache().get('key'))
+
+    def test_tiered_cache_staleness_is_bounded(self):
+        cache = self.make_cache(TieredCache, L1_TIMEOUT=0.05)
+        shared = self.make_cache()
+        cache.set('key', 'old')
+        shared.set('key', 'new')
+        self.assertEqual(cache.get('key'), 'old')
+        time.sleep(0.1)
+        self.assertEqual(cache.get('key'), 'new')
+
+
+class SQLiteTuningTest(TransactionTestCase):
+    """Прагмы SQLite и повтор транзакций при блокировке базы"""
+    def test_new_connection_gets_pragmas(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        }, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_locked_transaction_is_retried(self):
+        func = mock.Mock(side_effect=[
+            OperationalError('database is locked'),
+            OperationalError('database is locked'),
+            'done',
+        ])
+        retried = retry_on_locked(func, attempts=3, delay=0)
+        self.assertEqual(retried(), 'done')
+        self.assertEqual(func.call_count, 3)
+
+    def test_other_errors_and_last_attempt_are_raised(self):
+        func = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(func, attempts=3, delay=0)()
+        self.assertEqual(func.call_count, 1)
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_locked(func, attempts=2, delay=0)()
+        self.assertEqual(func.call_count, 2)
+
+
+class MetricsTest(TestCase):
+    """Метрики запросов, эндпоинт /metrics/ и журнал медленных запросов"""
+    def setUp(self):
+        cache.clear()
+        self.registry = metrics.Registry()
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_request_is_recorded_per_view(self):
+        self.client.get(reverse('posts:posts'))
+        self.client.get(reverse('posts:posts'))
+        labels = (('view', 'posts:posts'), ('method', 'GET'))
+        self.assertEqual(self.registry.duration.series[labels][2], 2)
+        counts, queries, _ = self.registry.db_queries.series[labels]
+        self.assertGreater(queries, 0)
+        self.assertGreater(
+            self.registry.cache.series[
+                (('view', 'posts:posts'), ('result', 'hit'))], 0)
+        self.assertEqual(self.registry.responses.series[
+            (('view', 'posts:posts'), ('status', 200))], 2)
+        self.assertIsNone(metrics.current())
+
+    def test_endpoint_renders_prometheus_text(self):
+        self.client.get(reverse('posts:posts'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:posts",method="GET",le="+Inf"} 1', text)
+        self.assertIn('yatube_request_template_duration_seconds_count{'
+                      'view="posts:posts",method="GET"} 1', text)
+
+    def test_endpoint_is_hidden_from_other_addresses(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 404)
+        # за прокси REMOTE_ADDR — адрес самого прокси
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_requires_token_when_configured(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer secret',
+            HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD=0)
+    def test_slow_request_is_logged_with_statements(self):
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('posts:posts'))
+        self.assertIn('posts:posts', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class SettingsProfilesTest(SimpleTestCase):
+    """Профили настроек: в prod нет отладочных надстроек"""
+    def load(self, name, **environ):
+        module = f'yatube.settings.{name}'
+        self.addCleanup(sys.modules.pop, module, None)
+        sys.modules.pop(module, None)
+        with mock.patch.dict(os.environ, environ):
+            return importlib.import_module(module)
+
+    def test_prod_strips_debug_overhead(self):
+        prod = self.load('prod', DJANGO_SECRET_KEY='secret')
+        self.assertFalse(prod.DEBUG)
+        self.assertNotIn('debug_toolbar', prod.INSTALLED_APPS)
+        self.assertFalse(any('debug_toolbar' in name
+                             for name in prod.MIDDLEWARE))
+        self.assertEqual(
+            prod.STATICFILES_STORAGE,
+            'django.contrib.staticfiles.storage.ManifestStaticFilesStorage')
+        [(loader, _)] = prod.TEMPLATES[0]['OPTIONS']['loaders']
+        self.assertEqual(loader, 'django.template.loaders.cached.Loader')
+
+    def test_prod_requires_secret_key(self):
+        with mock.patch.dict(os.environ), self.assertRaises(
+                ImproperlyConfigured):
+            os.environ.pop('DJANGO_SECRET_KEY', None)
+            self.load('prod')
+
+    def test_env_is_required(self):
+        """Без DJANGO_ENV сервер не стартует молча с DEBUG"""
+        spec = importlib.util.find_spec('yatube.settings')
+        with mock.patch.dict(os.environ), self.assertRaises(
+                ImproperlyConfigured):
+            os.environ.pop('DJANGO_ENV', None)
+            os.environ['DJANGO_SETTINGS_MODULE'] = 'yatube.settings'
+            spec.loader.exec_module(importlib.util.module_from_spec(spec))
+
+    def test_dev_keeps_debug_toolbar(self):
+        dev = self.load('dev')
+        self.assertTrue(dev.DEBUG)
+        self.assertIn('debug_toolbar', dev.INSTALLED_APPS)
+
+
+def call_asgi(application, scope, body=b''):
+    """Запрос к ASGI-приложению; тело приходит двумя сообщениями."""
+    messages = [
+        {'type': 'http.request', 'body': body[:1], 'more_body': True},
+        {'type': 'http.request', 'body': body[1:]},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application({'type': 'http', **scope}, receive, send))
+    return sent
+
+
+class ASGIHandlerTest(SimpleTestCase):
+    """WSGI-приложение под ASGI: environ, тело запроса и ответ"""
+    def test_request_and_response_are_translated(self):
+        seen = {}
+
+        def application(environ, start_response):
+            seen.update(environ, body=environ['wsgi.input'].read())
+            start_response('201 Created', [('X-Test', 'yes')])
+            return [b'first', b'', b'second']
+
+        sent = call_asgi(ASGIHandler(application, max_workers=1), {
+            'method': 'POST',
+            'path': '/app/посты/',
+            'root_path': '/app',
+            'query_string': b'page=2',
+            'headers': [(b'content-type', b'text/plain'),
+                        (b'cookie', b'a=1'), (b'cookie', b'b=2')],
+            'client': ('10.0.0.1', 1234),
+        }, body=b'payload')
+        self.assertEqual(seen['body'], b'payload')
+        self.assertEqual(seen['SCRIPT_NAME'], '/app')
+        self.assertEqual(
+            seen['PATH_INFO'].encode('latin-1').decode(), '/посты/')
+        self.assertEqual(seen['QUERY_STRING'], 'page=2')
+        self.assertEqual(seen['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(seen['HTTP_COOKIE'], 'a=1; b=2')
+        self.assertEqual(seen['REMOTE_ADDR'], '10.0.0.1')
+        self.assertEqual(sent, [
+            {'type': 'http.response.start', 'status': 201,
+             'headers': [(b'x-test', b'yes')]},
+            {'type': 'http.response.body', 'body': b'first',
+             'more_body': True},
+            {'type': 'http.response.body', 'body': b'second',
+             'more_body': True},
+            {'type': 'http.response.body', 'body': b''},
+        ])
+
+    def test_django_page_and_lifespan(self):
+        handler = ASGIHandler(get_wsgi_application(), max_workers=2)
+        sent = call_asgi(handler, {
+            'method': 'GET', 'path': reverse('about:author')})
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn('text/html', dict(sent[0]['headers'])[b'content-type']
+                      .decode())
+
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        replies = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            replies.append(message['type'])
+
+        asyncio.run(handler({'type': 'lifespan'}, receive, send))
+        self.assertEqual(replies, ['lifespan.startup.complete',
+                                   'lifespan.shutdown.complete'])
+
+
+calls = []
+
+
+@jobs.task(max_attempts=2)
+def remember(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError('ошибка задачи')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=0)
+class JobQueueTest(TestCase):
+    """Очередь задач: ключи идемпотентности, повторы, метрики"""
+    def setUp(self):
+        calls.clear()
+
+    def test_key_deduplicates_only_waiting_jobs(self):
+        jobs.enqueue(remember, key='same', value=1)
+        jobs.enqueue(remember, key='same', value=2)
+        self.assertEqual(Job.objects.count(), 1)
+        [job] = jobs.claim()
+        # пока задача выполняется, такое же событие снова ставится
+        jobs.enqueue(remember, key='same', value=3)
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertTrue(jobs.run(job))
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(calls, [1, 3])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_then_kept(self):
+        jobs.enqueue(remember, value=1, fail=True)
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 2)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('ошибка задачи', job.last_error)
+        self.assertEqual(calls, [1, 1])
+
+    def test_delayed_and_abandoned_jobs(self):
+        jobs.enqueue(remember, delay=60, value=1)
+        self.assertEqual(jobs.claim(), [])
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(len(jobs.claim()), 1)
+        self.assertEqual(jobs.claim(), [])
+        # воркер, взявший задачу, так и не вернулся
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        [job] = jobs.claim()
+        self.assertEqual(job.attempts, 2)
+        # задача роняет воркер: попытки кончились, больше не берётся
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(jobs.claim(), [])
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+        self.assertEqual(jobs.claim(), [])
+
+    def test_queue_depth_in_metrics(self):
+        jobs.enqueue(remember, value=1)
+        jobs.enqueue(remember, value=2)
+        self.assertIn(
+            'yatube_jobs{name="core.tests.remember",status="queued"} 2',
+            metrics.registry.render())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        jobs.enqueue(remember, key='eager', value=1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Чтение с реплики и привязка сессии к основной базе после записи"""
+    # реплика в тестах — второе соединение к той же базе в памяти; в
+    # открытой транзакции TestCase она упиралась бы в блокировку таблиц
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(text='Пост', author=self.user)
+        self.client.force_login(self.user)
+
+    def queries(self, url, **kwargs):
+        """Число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_read_views_use_replica(self):
+        for url in (
+            reverse('posts:posts'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                primary, replica = self.queries(url)
+                self.assertGreater(replica, 0)
+                # из основной базы — только сессия
+                self.assertEqual(primary, 1)
+        self.assertIsNone(replicas.current())
+
+    def test_write_pins_session_to_primary(self):
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        primary, replica = self.queries(reverse('posts:posts'))
+        self.assertEqual(replica, 0)
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+        session = self.client.session
+        session[replicas.SESSION_KEY] = time.time() - 1
+        session.save()
+        primary, replica = self.queries(reverse('posts:posts'))
+        self.assertGreater(replica, 0)
+
+    def test_reads_do_not_pin_session(self):
+        self.queries(reverse('posts:posts'))
+        self.assertNotIn(replicas.SESSION_KEY, self.client.session)
+
+    def test_sync_drops_pages_from_stale_replica(self):
+        url = reverse('posts:posts')
+        # основная база записала пост и сменила версию ленты, а реплика
+        # ещё не получила запись
+        caching.bump('posts')
+        stale = self.client.get(url)
+        self.assertContains(stale, 'Пост')
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Исправленный', updated=timezone.now())
+        with mock.patch.object(replicas, 'copy_sqlite'):
+            self.assertEqual(replicas.sync(), ['replica'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+
+class ReplicaSyncTest(SimpleTestCase):
+    """Копирование основной базы SQLite в реплику"""
+    def test_copy_sqlite_refreshes_replica(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'db.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with closing(sqlite3.connect(source)) as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE post (text TEXT)')
+            db.execute("INSERT INTO post VALUES ('первый')")
+            db.commit()
+            replicas.copy_sqlite(source, target)
+            db.execute("INSERT INTO post VALUES ('второй')")
+            db.commit()
+            with closing(sqlite3.connect(target)) as replica:
+                self.assertEqual(
+                    replica.execute('SELECT count(*) FROM post').fetchone(),
+                    (1,))
+                replicas.copy_sqlite(source, target)
+                self.assertEqual(
+                    replica.execute('SELECT count(*) FROM post').fetchone(),
+                    (2,))
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -14,4 +19,29 @@ def permission_denied(request, exception):
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    return render(request, 'core/403csrf.html', status=403)
+
+
+def metrics_allowed(request):
+    if settings.METRICS_TOKEN:
+        return constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}',
+        )
+    # запрос через прокси приходит с его адреса, обычно 127.0.0.1
+    proxied = ('HTTP_X_FORWARDED_FOR' in request.META
+               or 'HTTP_FORWARDED' in request.META)
+    return not proxied and (
+        request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus. Эндпоинт
+    внутренний: без токена и не с разрешённого адреса его как будто
+    нет."""
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        request_metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -5,6 +5,8 @@ import sys
 
 def main():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    os.environ.setdefault(
+        'DJANGO_ENV', 'test' if sys.argv[1:2] == ['test'] else 'dev')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
@@ -16,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # поиск по полнотекстовому индексу вместо LIKE '%...%'
+        expression = search.match_expression(search_term)
+        if expression is None:
+            return queryset, False
+        return search.filter_matching(queryset, expression), False
+
 
 class GroupAdmin(admin.ModelAdmin):  # добавил еще и группу
     list_display = (
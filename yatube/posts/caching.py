@@ -0,0 +1,216 @@
+"""Версионированные ключи кеша лент.
+
+У каждой ленты есть область (scope): общая лента ``posts``, группа
+``group:<id>``, автор ``author:<id>``, лента подписок ``follow:<id>`` и
+комментарии поста ``post:<id>``. Версия области — случайный токен в
+кеше; он входит в ключи закешированных фрагментов. Сигналы моделей
+меняют токен при изменении содержимого ленты, и старые фрагменты просто
+перестают находиться, поэтому кешировать их можно надолго. Версии
+лежат в отдельном алиасе кеша без локального L1-уровня, чтобы сброс был
+сразу виден всем процессам.
+
+Карточки постов кешируются ещё и по отдельности: одна и та же карточка
+выводится в общей ленте, группе, профиле и подписках, а ключ её
+фрагмента — id поста, время его изменения (Post.updated) и версия
+области ``user:<id>`` автора: в карточке есть его имя. Эту версию
+меняет только сохранение пользователя, не его новые посты.
+
+Страница, прочитанная с реплики базы, зависит ещё и от того, насколько
+реплика отстала, поэтому к её областям добавляется ``replica:<alias>``;
+версию меняет синхронизация реплики (core.replicas.synced).
+
+Те же версии дают ETag и Last-Modified HTML-страниц (conditional_page):
+браузер или CDN перепроверяет страницу, и неизменившаяся лента
+отдаётся ответом 304 без рендеринга шаблона.
+"""
+import hashlib
+import time
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+from core import replicas
+
+from .models import TimelineEntry
+
+VERSIONS_CACHE = 'feed_versions'
+VERSION_KEY = 'feed-version:{}'
+CARD_KEY = 'post-card:{}:{}:{}'
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+BUMP_BATCH_SIZE = 500
+
+
+def _new_version():
+    # Токен, а не счётчик: версия, вытесненная из кеша, не начнётся
+    # заново с уже использованного значения. Перед токеном — время
+    # смены версии, из него берётся Last-Modified страниц.
+    return f'{int(time.time()):x}-{uuid4().hex[:12]}'
+
+
+def _changed_at(version):
+    try:
+        return int(version.split('-', 1)[0], 16)
+    except ValueError:
+        return None
+
+
+def get_versions(scopes):
+    """Версии областей по отдельности: {область: версия} за одно
+    обращение к кешу."""
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    versions = caches[VERSIONS_CACHE].get_many(list(keys))
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        caches[VERSIONS_CACHE].set_many(missing, timeout=None)
+        versions.update(missing)
+    return {scope: versions[key] for key, scope in keys.items()}
+
+
+def get_state(*scopes):
+    """Общая версия нескольких областей и время последнего изменения
+    любой из них (timestamp) за одно обращение к кешу."""
+    replica = replicas.current()
+    if replica:
+        scopes = (*scopes, f'replica:{replica}')
+    versions = get_versions(scopes)
+    changed = [_changed_at(versions[scope]) for scope in scopes]
+    return (
+        '.'.join(versions[scope] for scope in scopes),
+        None if None in changed else max(changed),
+    )
+
+
+def get_version(*scopes):
+    """Общая версия нескольких областей за одно обращение к кешу."""
+    return get_state(*scopes)[0]
+
+
+def bump(*scopes):
+    if scopes:
+        caches[VERSIONS_CACHE].set_many(
+            {VERSION_KEY.format(scope): _new_version() for scope in scopes},
+            timeout=None,
+        )
+
+
+def feed_context(*scopes):
+    """Переменные для {% cache %} ленты в шаблоне."""
+    return {
+        'feed_version': get_version(*scopes),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def post_scopes(post, group_ids=()):
+    scopes = {'posts', f'author:{post.author_id}', f'post:{post.pk}'}
+    scopes.update(f'group:{group_id}' for group_id in group_ids if group_id)
+    return scopes
+
+
+def bump_post(post, group_ids=()):
+    """Сбрасывает ленты, в которых выводится пост, включая ленты
+    подписчиков, в которые он был разнесён."""
+    bump(*post_scopes(post, group_ids or (post.group_id,)))
+    bump_followers(post.pk)
+
+
+def bump_many(scopes):
+    """Сбрасывает версии областей из итератора пачками."""
+    batch = []
+    for scope in scopes:
+        batch.append(scope)
+        if len(batch) == BUMP_BATCH_SIZE:
+            bump(*batch)
+            batch = []
+    bump(*batch)
+
+
+def follower_scopes(post_id):
+    """Области лент подписчиков, в которые разнесён пост."""
+    followers = TimelineEntry.objects.filter(
+        post_id=post_id
+    ).values_list('user_id', flat=True).iterator()
+    return (f'follow:{user_id}' for user_id in followers)
+
+
+def bump_followers(post_id):
+    """Сбрасывает ленты подписчиков, в которые разнесён пост."""
+    bump_many(follower_scopes(post_id))
+
+
+def bump_on_commit(*scopes, using=None):
+    """Сбрасывает версии после коммита транзакции базы using.
+
+    Новая версия до коммита позволила бы параллельному запросу
+    закешировать под ней ещё старые строки."""
+    if scopes:
+        transaction.on_commit(lambda: bump_many(scopes), using=using)
+
+
+def card_key(post, author_version):
+    return CARD_KEY.format(
+        post.pk, post.updated.timestamp(), author_version)
+
+
+def post_cards(posts):
+    """Пары (пост, HTML карточки) для страницы ленты: все карточки
+    читаются из кеша одним get_many, рендерятся только промахи."""
+    posts = list(posts)
+    authors = get_versions({f'user:{post.author_id}' for post in posts})
+    keys = {
+        card_key(post, authors[f'user:{post.author_id}']): post
+        for post in posts
+    }
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in keys.items() if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.FEED_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [(post, mark_safe(cards[key])) for key, post in keys.items()]
+
+
+def conditional_page(get_scopes):
+    """Декоратор представления: ETag и Last-Modified по версиям областей,
+    которые вернёт get_scopes(request, *args, **kwargs), и ответ 304 на
+    If-None-Match / If-Modified-Since без вызова представления.
+
+    Страница зависит и от пользователя (шапка, кнопки), и от его
+    CSRF-cookie (формы), поэтому они входят в ETag. ETag слабый: токен
+    CSRF в разметке при каждом рендеринге свой."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(request, *args, **kwargs)
+            if not scopes:
+                return view(request, *args, **kwargs)
+            version, changed_at = get_state(*scopes)
+            digest = hashlib.sha1('|'.join((
+                version,
+                str(request.user.pk),
+                request.get_full_path(),
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            )).encode()).hexdigest()
+            etag = f'W/"{digest}"'
+            response = get_conditional_response(
+                request, etag=etag, last_modified=changed_at)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response['ETag'] = etag
+                    if changed_at is not None:
+                        response['Last-Modified'] = http_date(changed_at)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,127 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются одним UPDATE с F-выражением, поэтому параллельные
+запросы не теряют изменений. reconcile() пересчитывает их пачками и
+исправляет расхождения (например, после bulk_create в обход сигналов).
+До пересчёта счётчик может быть занижен, поэтому уменьшение не опускает
+его ниже нуля: иначе удаление нарушило бы CHECK >= 0 и упало с
+IntegrityError. Посты и комментарии в шардах (posts.shards)
+пересчитываются в каждом шарде отдельно.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Profile
+
+from . import shards
+from .models import Comment, Follow, Post, User
+
+PROFILE_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def _add(name, delta):
+    return Greatest(F(name) + delta, 0)
+
+
+def change_profile(user_id, **deltas):
+    """Атомарно прибавляет deltas к счётчикам профиля пользователя."""
+    changes = {name: _add(name, delta) for name, delta in deltas.items()}
+    if Profile.objects.filter(user_id=user_id).update(**changes):
+        return
+    # профиля ещё нет — создаём только при росте: уменьшение для
+    # удаляемого пользователя создавать профиль не должно. Счётчики
+    # пересчитываются целиком: изменение уже записано и попадёт в подсчёт,
+    # а старт с нуля занизил бы их на всё, что было до профиля
+    if all(delta > 0 for delta in deltas.values()):
+        reconcile_profiles([user_id])
+
+
+def change_comments(post_id, delta, using=None):
+    Post.objects.using(using).filter(pk=post_id).update(
+        comments_count=_add('comments_count', delta)
+    )
+
+
+def get_profile(user):
+    """Профиль пользователя; для старых пользователей без профиля
+    создаётся с пересчитанными счётчиками."""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        reconcile_profiles([user.pk])
+        return Profile.objects.get(user=user)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(count=Count('pk')).values('count'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def _post_counts(user_ids):
+    """Число постов пользователей user_ids по всем шардам."""
+    counts = defaultdict(int)
+    for posts in shards.each(Post.objects.filter(author_id__in=user_ids)):
+        for author_id, count in posts.order_by().values(
+                'author_id').annotate(count=Count('pk')).values_list(
+                'author_id', 'count'):
+            counts[author_id] += count
+    return counts
+
+
+def reconcile_profiles(user_ids):
+    """Пересчитывает счётчики профилей пользователей user_ids.
+    Возвращает число исправленных профилей."""
+    counted = dict(PROFILE_COUNTERS)
+    posts_count = None
+    if shards.enabled():
+        # подзапрос к постам в другой базе невозможен
+        del counted['posts_count']
+        posts_count = _post_counts(user_ids)
+    users = User.objects.filter(pk__in=user_ids).annotate(**{
+        f'actual_{name}': _count(model, field)
+        for name, (model, field) in counted.items()
+    })
+    profiles = Profile.objects.in_bulk(
+        list(user_ids), field_name='user_id')
+    missing, changed = [], []
+    for user in users:
+        actual = {name: getattr(user, f'actual_{name}')
+                  for name in counted}
+        if posts_count is not None:
+            actual['posts_count'] = posts_count[user.pk]
+        profile = profiles.get(user.pk)
+        if profile is None:
+            missing.append(Profile(user=user, **actual))
+        elif any(getattr(profile, name) != value
+                 for name, value in actual.items()):
+            for name, value in actual.items():
+                setattr(profile, name, value)
+            changed.append(profile)
+    Profile.objects.bulk_create(missing, ignore_conflicts=True)
+    Profile.objects.bulk_update(changed, list(PROFILE_COUNTERS))
+    return len(missing) + len(changed)
+
+
+def reconcile_comments(post_ids):
+    """Пересчитывает comments_count постов post_ids. Комментарии лежат в
+    шарде своего поста, поэтому считаются в каждом шарде."""
+    fixed = 0
+    for posts in shards.each(Post.objects.filter(pk__in=post_ids)):
+        changed = [
+            Post(pk=pk, comments_count=actual)
+            for pk, actual in posts.annotate(
+                actual=_count(Comment, 'post')
+            ).exclude(comments_count=F('actual')).values_list('pk', 'actual')
+        ]
+        Post.objects.using(posts.db).bulk_update(changed, ['comments_count'])
+        fixed += len(changed)
+    return fixed
@@ -0,0 +1,116 @@
+"""Дайджесты новых постов подписок по почте.
+
+Письма по одному на подписчика в post_create слишком медленны, поэтому
+новые посты копятся и раз в DIGEST_PERIOD (send_digests по расписанию)
+уходят одним письмом на подписчика. Подписчики обрабатываются пачками
+по pk: на пачку — запрос пользователей, запрос их подписок и запрос
+новых постов этих авторов, так что у автора со 100 тысячами подписчиков
+список не загружается целиком. Все письма прогона отправляются через
+одно соединение с почтовым бэкендом (send_mass_mail).
+
+Profile.last_digest_at — граница уже разосланного: следующий дайджест
+берёт посты после неё и до начала своего прогона.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mass_mail
+from django.utils import timezone
+
+from users.models import Profile
+
+from . import counters, shards
+from .utils import absolute_url
+from .models import Follow, Post, User
+
+SUBJECT = 'Новые посты в ваших подписках'
+# давно не получавшему дайджест — посты не старше стольких периодов
+MAX_PERIODS = 7
+
+
+def recipients(after=0, batch_size=None):
+    """Следующая пачка подписчиков с почтой: [(pk, email)]."""
+    return list(
+        User.objects.filter(pk__gt=after, follower__isnull=False)
+        .exclude(email='').order_by('pk').distinct()
+        .values_list('pk', 'email')[:batch_size or settings.DIGEST_BATCH_SIZE]
+    )
+
+
+def render(posts, total, usernames):
+    lines = [
+        f'{usernames[post["author_id"]]}: {post["text"][:200]}\n'
+        f'{absolute_url("posts:post_detail", post_id=post["pk"])}'
+        for post in posts
+    ]
+    if total > len(posts):
+        lines.append(f'И ещё постов: {total - len(posts)}')
+    return '\n\n'.join(lines)
+
+
+def send_batch(users, until, connection=None):
+    """Отправляет дайджесты пачке подписчиков users ([(pk, email)]) за
+    посты до until. Возвращает число отправленных писем."""
+    user_ids = [pk for pk, _ in users]
+    last_sent = dict(Profile.objects.filter(
+        user_id__in=user_ids).values_list('user_id', 'last_digest_at'))
+    missing = [pk for pk in user_ids if pk not in last_sent]
+    if missing:
+        counters.reconcile_profiles(missing)
+    period = timedelta(seconds=settings.DIGEST_PERIOD)
+    oldest = until - period * MAX_PERIODS
+    since = {
+        pk: max(last_sent.get(pk) or until - period, oldest)
+        for pk in user_ids
+    }
+
+    followers = defaultdict(list)
+    for user_id, author_id in Follow.objects.filter(
+            user_id__in=user_ids).values_list('user_id', 'author_id'):
+        followers[author_id].append(user_id)
+
+    posts = defaultdict(list)
+    totals = defaultdict(int)
+    usernames = dict(User.objects.filter(
+        pk__in=list(followers)).values_list('pk', 'username'))
+    new_posts = shards.for_authors(Post.objects.filter(
+        pub_date__gt=min(since.values()),
+        pub_date__lte=until,
+    ), list(followers)).order_by('-pub_date', '-pk').values(
+        'pk', 'text', 'pub_date', 'author_id')
+    for post in new_posts.iterator():
+        for user_id in followers[post['author_id']]:
+            if post['pub_date'] > since[user_id]:
+                totals[user_id] += 1
+                if len(posts[user_id]) < settings.DIGEST_MAX_POSTS:
+                    posts[user_id].append(post)
+
+    messages = [
+        (SUBJECT, render(posts[pk], totals[pk], usernames), None, [email])
+        for pk, email in users if posts[pk]
+    ]
+    sent = send_mass_mail(messages, connection=connection) if messages else 0
+    Profile.objects.filter(user_id__in=user_ids).update(last_digest_at=until)
+    return sent
+
+
+def batches(batch_size=None):
+    """Все подписчики с почтой пачками [(pk, email)]."""
+    after = 0
+    while True:
+        users = recipients(after, batch_size)
+        if not users:
+            return
+        yield users
+        after = users[-1][0]
+
+
+def send_digests(batch_size=None):
+    """Рассылает дайджесты всем подписчикам. Возвращает число писем."""
+    until = timezone.now()
+    sent = 0
+    with get_connection() as connection:
+        for users in batches(batch_size):
+            sent += send_batch(users, until, connection)
+    return sent
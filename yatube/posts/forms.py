@@ -1,6 +1,6 @@
 from django import forms
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
 
 
 class PostForm(forms.ModelForm):
@@ -21,3 +21,14 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Текст нового комментария',
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Найти', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name='slug',
+        label='Группа',
+        required=False,
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
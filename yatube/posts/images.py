@@ -0,0 +1,120 @@
+"""Нормализация загруженных картинок постов.
+
+Оригинал с камеры может весить мегабайты, а sorl декодирует его заново
+для каждой миниатюры. Поэтому фоновая задача (posts.tasks.process_image)
+перед созданием миниатюр уменьшает картинку до IMAGE_MAX_SIZE,
+поворачивает по EXIF и перекодирует без метаданных в IMAGE_FORMAT (WebP
+или прогрессивный JPEG) с качеством IMAGE_QUALITY. Пост переключается на
+новый файл, оригинал удаляется. Сколько байт было и стало, видно в
+метрике yatube_image_bytes_total и в выводе normalize_images.
+"""
+import logging
+import os
+import tempfile
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core import metrics
+
+from . import shards
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg'}
+# картинка в памяти до этого размера, дальше — во временном файле
+SPOOL_SIZE = 2 * 1024 * 1024
+
+Result = namedtuple('Result', 'name original_size stored_size')
+
+
+def output_format():
+    """IMAGE_FORMAT или JPEG, если Pillow собран без WebP."""
+    if settings.IMAGE_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.IMAGE_FORMAT
+
+
+def _must_shrink(image):
+    """Картинку нужно уменьшить или очистить от EXIF при любом размере
+    результата; иначе перекодировать стоит, только если файл станет
+    меньше."""
+    width, height = settings.IMAGE_MAX_SIZE
+    return (
+        image.width > width or image.height > height
+        or bool(image.info.get('exif'))
+    )
+
+
+def _encode(image, image_format, output):
+    """Уменьшает, поворачивает по EXIF и сохраняет картинку без
+    метаданных."""
+    if image.format == 'JPEG':
+        # JPEG декодируется сразу в уменьшенном масштабе: в память не
+        # попадает полноразмерный растр
+        image.draft('RGB', settings.IMAGE_MAX_SIZE)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(settings.IMAGE_MAX_SIZE, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    options = {'quality': settings.IMAGE_QUALITY}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(output, image_format, **options)
+
+
+def normalize(name):
+    """Нормализует картинку name и переключает на неё посты.
+
+    Возвращает Result с именем итогового файла; если картинка уже в
+    нужном виде или обработать её не удалось, имя остаётся прежним."""
+    storage = default_storage
+    try:
+        original_size = storage.size(name)
+        image_format = output_format()
+        with storage.open(name) as source, tempfile.SpooledTemporaryFile(
+                SPOOL_SIZE) as output:
+            image = Image.open(source)
+            must_shrink = _must_shrink(image)
+            if getattr(image, 'is_animated', False) or (
+                    not must_shrink and image.format == image_format):
+                return Result(name, original_size, original_size)
+            _encode(image, image_format, output)
+            stored_size = output.tell()
+            if not must_shrink and stored_size >= original_size:
+                return Result(name, original_size, original_size)
+            output.seek(0)
+            stem = os.path.splitext(name)[0]
+            new_name = storage.save(
+                stem + EXTENSIONS[image_format], File(output))
+    except Exception:
+        logger.exception('Не удалось нормализовать картинку %s', name)
+        return Result(name, 0, 0)
+
+    switched = sum(
+        posts.update(image=new_name, updated=timezone.now())
+        for posts in shards.each(Post.objects.filter(image=name))
+    )
+    if not switched:
+        # пост успели удалить или сменить ему картинку
+        storage.delete(new_name)
+        return Result(name, 0, 0)
+    if not any(posts.exists()
+               for posts in shards.each(Post.objects.filter(image=name))):
+        storage.delete(name)
+    metrics.registry.record_image(original_size, stored_size)
+    logger.info('Картинка %s -> %s: %d -> %d байт',
+                name, new_name, original_size, stored_size)
+    return Result(new_name, original_size, stored_size)
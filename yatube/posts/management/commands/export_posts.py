@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import shards, transfer
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты в файл JSON Lines или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки или - для stdout.',
+        )
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов читать из базы за раз.',
+        )
+        parser.add_argument('--author', help='Только посты автора.')
+        parser.add_argument('--group', help='Только посты группы (slug).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or transfer.detect_format(path)
+        # авторы и группы — в основной базе, посты могут быть в шардах:
+        # фильтры по их id, а не JOIN
+        posts = Post.objects.select_related('author', 'group')
+        if options['group']:
+            posts = posts.filter(group_id__in=list(Group.objects.filter(
+                slug=options['group']).values_list('pk', flat=True)))
+        if options['author']:
+            posts = shards.for_authors(posts, list(User.objects.filter(
+                username=options['author']).values_list('pk', flat=True)))
+        else:
+            posts = shards.merged(posts)
+        started = time.perf_counter()
+        stream = self.stdout if path == '-' else open(
+            path, 'w', encoding='utf-8', newline='')
+        rows = 0
+        try:
+            records = transfer.export_records(posts, options['batch_size'])
+            for rows, _ in enumerate(
+                    transfer.write_records(stream, fmt, records), 1):
+                if rows % options['batch_size'] == 0:
+                    self.stderr.write(f'\r{rows} постов', ending='')
+        finally:
+            if stream is not self.stdout:
+                stream.close()
+        seconds = max(time.perf_counter() - started, 1e-9)
+        self.stderr.write(self.style.SUCCESS(
+            f'\nВыгружено постов: {rows}, {round(rows / seconds)} в секунду'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры картинок постов.'
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct().iterator()
+        # варианты до DEFAULT_WIDTH есть у любой картинки
+        required = len(thumbnails.variant_widths(0))
+        created = 0
+        for name in names:
+            if len(thumbnails.ready_variants(name)) < required:
+                thumbnails.generate(name)
+                created += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created}'
+        ))
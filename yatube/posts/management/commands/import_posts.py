@@ -0,0 +1,72 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты из файла JSON Lines или CSV с полями '
+            'text, author, group, pub_date, image.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами или - для stdin.')
+        parser.add_argument('--format', choices=transfer.FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько постов вставлять в одной транзакции.',
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Создавать отсутствующих авторов без пароля.',
+        )
+        parser.add_argument(
+            '--create-groups', action='store_true',
+            help='Создавать отсутствующие группы.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or transfer.detect_format(path)
+        importer = transfer.Importer(
+            create_authors=options['create_authors'],
+            create_groups=options['create_groups'],
+        )
+        started = time.perf_counter()
+        stream = sys.stdin if path == '-' else open(
+            path, encoding='utf-8', newline='')
+        try:
+            records = transfer.read_records(stream, fmt)
+            line = 1
+            for batch in transfer.batches(records, options['batch_size']):
+                importer.import_batch(batch, line)
+                line += len(batch)
+                # при DEBUG=True журнал запросов рос бы с каждой пачкой
+                reset_queries()
+                self.report(importer.imported, started)
+        except ValueError as error:
+            raise CommandError(f'Запись {line}: {error}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # и при ошибке: уже вставленные пачки остаются в базе
+            self.stderr.write('')
+            transfer.finish_import(importer.author_ids, importer.group_ids)
+        for number, error in importer.errors:
+            self.stderr.write(f'Запись {number} пропущена: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {importer.imported}, '
+            f'пропущено: {len(importer.errors)}, '
+            f'{self.rate(importer.imported, started)} в секунду'
+        ))
+
+    def rate(self, rows, started):
+        return round(rows / max(time.perf_counter() - started, 1e-9))
+
+    def report(self, rows, started):
+        self.stderr.write(
+            f'\r{rows} постов, {self.rate(rows, started)} в секунду',
+            ending='',
+        )
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Нормализует уже загруженные картинки постов и выводит, '
+            'сколько места это сэкономило.')
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').values_list(
+            'image', flat=True).distinct().order_by('image'))
+        changed = original = stored = 0
+        for name in names:
+            result = images.normalize(name)
+            if result.name != name:
+                changed += 1
+                original += result.original_size
+                stored += result.stored_size
+                thumbnails.generate(result.name)
+        saved = original - stored
+        share = saved / original if original else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Нормализовано картинок: {changed} из {len(names)}, '
+            f'{original / 2**20:.1f} МБ -> {stored / 2**20:.1f} МБ, '
+            f'сэкономлено {saved / 2**20:.1f} МБ ({share:.0%})'
+        ))
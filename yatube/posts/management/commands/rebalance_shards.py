@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import shards
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты с комментариями в шард автора после '
+            'изменения POST_SHARDS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', action='append', dest='sources',
+            help='Проверить и эту базу (например, выведенный из '
+                 'POST_SHARDS шард). По умолчанию — все шарды.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=shards.BATCH_SIZE,
+            help='Сколько постов переносить за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько постов куда переедет.',
+        )
+
+    def handle(self, *args, **options):
+        if not shards.enabled():
+            raise CommandError('Шарды не настроены (POST_SHARDS).')
+        sources = options['sources']
+        if sources:
+            sources = shards.aliases() + [
+                alias for alias in sources if alias not in shards.aliases()]
+        moved = shards.rebalance(
+            sources, options['batch_size'], options['dry_run'])
+        verb = 'Переедет' if options['dry_run'] else 'Перенесено'
+        for (source, target), count in sorted(moved.items()):
+            self.stdout.write(f'{source} -> {target}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} постов: {sum(moved.values())}'
+        ))
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты пересобрать (по умолчанию все).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=timeline.BATCH_SIZE,
+            help='Размер пачки при вставке записей ленты.',
+        )
+
+    def handle(self, *args, **options):
+        users = Follow.objects.values_list('user_id', flat=True).distinct()
+        if options['usernames']:
+            users = User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('pk', flat=True)
+        rebuilt = 0
+        for user_ids in timeline._batches(users.iterator(),
+                                          options['batch_size']):
+            timeline.rebuild(user_ids, options['batch_size'])
+            rebuilt += len(user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {rebuilt}'
+        ))
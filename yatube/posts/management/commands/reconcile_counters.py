@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from core import jobs
+from posts import counters, shards, tasks
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок и '
+            'комментариев и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей или постов проверять за раз.',
+        )
+        parser.add_argument(
+            '--defer', action='store_true',
+            help='Поставить пачки в очередь фоновых задач (run_workers).',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['defer']:
+            batches = self.reconcile(
+                User.objects.all(), self.defer(tasks.reconcile_profiles,
+                                               'user_ids'), batch_size)
+            for posts in shards.each(Post.objects.all()):
+                batches += self.reconcile(
+                    posts, self.defer(tasks.reconcile_comments, 'post_ids'),
+                    batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'Поставлено в очередь пачек: {batches}'
+            ))
+            return
+        profiles = self.reconcile(
+            User.objects.all(), counters.reconcile_profiles, batch_size)
+        posts = sum(
+            self.reconcile(queryset, counters.reconcile_comments, batch_size)
+            for queryset in shards.each(Post.objects.all())
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено профилей: {profiles}, постов: {posts}'
+        ))
+
+    def defer(self, task, argument):
+        def enqueue(pks):
+            jobs.enqueue(task, key=f'{task.job_name}:{pks[0]}-{pks[-1]}',
+                         **{argument: pks})
+            return 1
+        return enqueue
+
+    def reconcile(self, queryset, reconcile_batch, batch_size):
+        """Проходит таблицу пачками по возрастанию pk."""
+        fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return fixed
+            fixed += reconcile_batch(pks)
+            last_pk = pks[-1]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import jobs
+from posts import digests, tasks
+
+
+class Command(BaseCommand):
+    help = ('Рассылает подписчикам дайджест новых постов их подписок. '
+            'Запускается по расписанию раз в DIGEST_PERIOD.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Сколько подписчиков обрабатывать за раз.',
+        )
+        parser.add_argument(
+            '--defer', action='store_true',
+            help='Поставить пачки в очередь фоновых задач (run_workers).',
+        )
+
+    def handle(self, *args, **options):
+        if options['defer']:
+            until = timezone.now().isoformat()
+            count = 0
+            for users in digests.batches(options['batch_size']):
+                jobs.enqueue(
+                    tasks.send_digest_batch,
+                    key=f'digest:{until}:{users[0][0]}',
+                    user_ids=[pk for pk, _ in users],
+                    until=until,
+                )
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'Поставлено в очередь пачек: {count}'
+            ))
+            return
+        sent = digests.send_digests(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {sent}'))
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_comments_count(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Post = apps.get_model('posts', 'Post')
+    counts = Comment.objects.values('post_id').annotate(
+        count=Count('pk')).values_list('post_id', 'count')
+    for post_id, count in counts.iterator():
+        Post.objects.filter(pk=post_id).update(comments_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
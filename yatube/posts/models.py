@@ -15,32 +15,96 @@ class Group(models.Model):
         return self.title
 
 
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        # без явного using базу выбирает роутер по самому объекту
+        # (шард автора, см. posts.shards), а не по одной модели
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class PostQuerySet(ShardedQuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'updated',
+        'image',
+        'comments_count',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__title',
+        'group__slug',
+    )
+
+    def feed(self):
+        """Посты для ленты: автор и группа подтягиваются одним запросом,
+        из базы читаются только выводимые в карточке поля."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(CreatedModel):
     text = models.TextField(verbose_name='Текст')
+    # без внешних ключей в базе: посты могут лежать в шардах
+    # (posts.shards), а группы и пользователи — в основной базе
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
         related_name='posts',
+        db_constraint=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name='posts'
+        related_name='posts',
+        db_constraint=False,
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    comments_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    COUNTER_FIELDS = ('comments_count',)
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = (
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # счётчик меняется только F-выражениями: сохранение поста с
+        # устаревшим значением в памяти не должно его затирать
+        if self.pk and not self._state.adding and (
+                kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post,
@@ -55,14 +119,22 @@ class Comment(models.Model):
                                on_delete=models.CASCADE,
                                related_name='comments',
                                verbose_name='Автор',
+                               db_constraint=False,
                                )
     text = models.TextField('Текст комментария',)
     created = models.DateTimeField('Дата комментария',
                                    auto_now_add=True,
                                    )
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'),
+        )
 
 
 class Follow(models.Model):
@@ -82,3 +154,35 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='follow_uniq'),
         )
+        indexes = (
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx'),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: строка на пару
+    (подписчик, пост), заполняется при публикации поста."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        constraints = (models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='timeline_uniq'),
+        )
+        indexes = (
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='timeline_user_pub_date_idx'),
+        )
@@ -0,0 +1,131 @@
+"""Полнотекстовый поиск по постам через FTS5.
+
+Индекс posts_post_fts создаётся миграцией 0011 и поддерживается
+триггерами. Запрос пользователя не передаётся в MATCH как есть:
+из него берутся слова, каждое берётся в кавычки (операторы FTS5 в
+тексте запроса не срабатывают), последнее ищется по префиксу.
+Результаты упорядочены по bm25 — чем меньше, тем релевантнее.
+
+SQLite выполняет многие изменения схемы пересозданием таблицы, и
+триггеры posts_post при этом пропадают. Поэтому после каждого migrate
+ensure_triggers() создаёт недостающие и перестраивает индекс.
+"""
+import re
+
+from django.db.models import FloatField, TextField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+ORDERING = ('rank', 'id')
+SNIPPET_TOKENS = 24
+# маркеры подсветки: в тексте постов их нет, и до экранирования
+# сниппета они не могут стать HTML
+MARK_START = '\x02'
+MARK_END = '\x03'
+WORD_RE = re.compile(r'\w+')
+
+TRIGGERS = {
+    'posts_post_fts_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    'posts_post_fts_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    """,
+    'posts_post_fts_update': f"""
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+}
+
+
+def ensure_triggers(connection):
+    """Восстанавливает триггеры индекса, если их нет, и перестраивает
+    индекс: изменения, сделанные без триггеров, в нём не отражены."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        if FTS_TABLE not in tables:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'posts_post'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Безопасное выражение MATCH или None, если искать нечего."""
+    words = WORD_RE.findall(query or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_matching(queryset, expression):
+    """Посты queryset, подходящие под выражение, без ранжирования."""
+    # не pk__in=RawSQL(...): Django возьмёт подзапрос во вторые скобки,
+    # и SQLite сочтёт его скалярным, вернув только первую строку
+    return queryset.extra(
+        where=[f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s)'],
+        params=[expression],
+    )
+
+
+def search(query, queryset=None):
+    """Посты, найденные по запросу, с рангом rank и сниппетом snippet.
+    Пустой запрос ничего не находит."""
+    if queryset is None:
+        queryset = Post.objects.feed()
+    queryset = queryset.annotate(
+        rank=RawSQL(f'bm25({FTS_TABLE})', (), output_field=FloatField()),
+        snippet=RawSQL(
+            f"snippet({FTS_TABLE}, 0, %s, %s, '…', %s)",
+            (MARK_START, MARK_END, SNIPPET_TOKENS),
+            output_field=TextField(),
+        ),
+    ).order_by(*ORDERING)
+    expression = match_expression(query)
+    if expression is None:
+        return queryset.none()
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[
+            f'{FTS_TABLE}.rowid = posts_post.id',
+            f'{FTS_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    )
+
+
+def highlight(snippet):
+    """Сниппет в HTML: текст экранирован, найденные слова в <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
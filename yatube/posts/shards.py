@@ -0,0 +1,404 @@
+"""Шардирование постов и комментариев по автору.
+
+POST_SHARDS — алиасы баз из DATABASES, между которыми делятся посты.
+Пост лежит в шарде своего автора, комментарии — в шарде своего поста,
+чтобы комментарии поста читались из одной базы. Пользователи, группы,
+подписки и всё остальное остаются в основной базе default, поэтому
+ссылки поста на автора и группу в шарде — без внешних ключей.
+
+Шард автора выбирается rendezvous hashing по author_id: при добавлении
+шарда переезжают только авторы, для которых он стал лучшим, остальные
+остаются на месте. Переносит их команда rebalance_shards.
+
+Ключи постов и комментариев общие для всех шардов: их выдаёт
+последовательность core.models.Sequence в основной базе. Поэтому
+строка переезжает между шардами без смены id, а ленты по всем шардам
+упорядочиваются по (pub_date, id).
+
+Ленты по нескольким шардам (merged, for_authors) — MergedQuerySet:
+запрос выполняется в каждом шарде, отсортированные потоки сливаются
+лениво, и из шарда читается не больше строк, чем нужно для страницы.
+Автор и группа подставляются одним запросом к основной базе на
+страницу вместо JOIN.
+
+Без POST_SHARDS всё работает как прежде: функции модуля возвращают
+обычные запросы.
+"""
+import heapq
+import zlib
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Max
+from django.http import Http404
+
+from core.models import Sequence
+
+from .models import Comment, Post, User
+
+PRIMARY = 'default'
+ORDERING = ('-pub_date', '-id')
+SHARDED_MODELS = (Post, Comment)
+BATCH_SIZE = 500
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def aliases():
+    """Базы, в которых лежат посты."""
+    return list(settings.POST_SHARDS) or [PRIMARY]
+
+
+def shard_for(author_id, shards=None):
+    """Шард автора: у каждого шарда свой вес для автора, побеждает
+    наибольший."""
+    return max(
+        shards or aliases(),
+        key=lambda alias: zlib.crc32(f'{alias}:{author_id}'.encode()),
+    )
+
+
+def allocate_ids(model, count=1):
+    """Следующие count ключей model, общие для всех шардов."""
+    name = model._meta.label_lower
+    sequences = Sequence.objects.using(PRIMARY).filter(name=name)
+    with transaction.atomic(using=PRIMARY):
+        if not sequences.update(value=F('value') + count):
+            # первая выдача продолжает наибольший из уже занятых ключей
+            start = max(
+                model._base_manager.using(alias).aggregate(
+                    last=Max('pk'))['last'] or 0
+                for alias in aliases()
+            )
+            Sequence.objects.using(PRIMARY).bulk_create(
+                [Sequence(name=name, value=start)], ignore_conflicts=True)
+            sequences.update(value=F('value') + count)
+        last = sequences.values_list('value', flat=True).get()
+    return range(last - count + 1, last + 1)
+
+
+def locate(post_id):
+    """Шард, в котором лежит пост, или None."""
+    for alias in aliases():
+        if Post._base_manager.using(alias).filter(pk=post_id).exists():
+            return alias
+    return None
+
+
+class ShardRouter:
+    """Размещает посты по шарду автора, комментарии — по шарду поста.
+    Связанные с ними объекты других моделей читаются из основной
+    базы."""
+
+    def route(self, model, instance=None, **hints):
+        if not enabled():
+            return None
+        sharded = isinstance(instance, SHARDED_MODELS)
+        if not issubclass(model, SHARDED_MODELS):
+            return PRIMARY if sharded else None
+        if sharded and instance._state.db and not instance._state.adding:
+            return instance._state.db
+        if model is Post and isinstance(instance, Post):
+            return shard_for(instance.author_id)
+        if model is Post and isinstance(instance, User):
+            return shard_for(instance.pk)
+        if model is Comment and isinstance(instance, Comment):
+            post = Comment.post.field.get_cached_value(instance, None)
+            if post is not None and post._state.db:
+                return post._state.db
+            return locate(instance.post_id)
+        if sharded:
+            return instance._state.db
+        return None
+
+    db_for_read = route
+    db_for_write = route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if enabled() and (isinstance(obj1, SHARDED_MODELS)
+                          or isinstance(obj2, SHARDED_MODELS)):
+            databases = {PRIMARY, *aliases()}
+            if {obj1._state.db, obj2._state.db} <= databases:
+                return True
+        return None
+
+
+def _split_related(queryset):
+    """Запрос без JOIN с таблицами основной базы и имена связей, объекты
+    которых подставляются после выборки."""
+    select_related = queryset.query.select_related
+    if not select_related:
+        return queryset, ()
+    model = queryset.model
+    if select_related is True:
+        names = [field.name for field in model._meta.concrete_fields
+                 if field.is_relation]
+    else:
+        names = list(select_related)
+    local = [name for name in names if issubclass(
+        model._meta.get_field(name).related_model, SHARDED_MODELS)]
+    remote = tuple(name for name in names if name not in local)
+    queryset = queryset.select_related(None)
+    if local:
+        queryset = queryset.select_related(*local)
+    fields, deferred = queryset.query.deferred_loading
+    if fields and not deferred:
+        # only('author__username') оставляет от связи только author_id
+        queryset = queryset.defer(None).only(
+            *{name.split('__')[0] for name in fields})
+    elif fields:
+        queryset = queryset.defer(None).defer(
+            *(name for name in fields if '__' not in name))
+    return queryset, remote
+
+
+def _default_ordering(queryset):
+    ordering = tuple(
+        queryset.query.order_by or queryset.model._meta.ordering)
+    if not ordering:
+        return ('id',)
+    if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+        # последнее поле сортировки должно быть уникальным
+        ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+    return ordering
+
+
+class MergedQuerySet:
+    """Запросы к нескольким шардам как один отсортированный список.
+
+    Умеет то, что нужно пагинаторам и лентам: filter(), exclude(),
+    order_by(), values(), count() и срезы. Направление сортировки у
+    всех полей должно быть одинаковым."""
+    ordered = True
+
+    def __init__(self, model, querysets, ordering, related=()):
+        self.model = model
+        self.querysets = querysets
+        self.ordering = tuple(ordering)
+        self.related = related
+
+    def __repr__(self):
+        shards = ', '.join(self.querysets)
+        return f'<MergedQuerySet {self.model.__name__} from {shards}>'
+
+    def _clone(self, method, *args, ordering=None, related=None, **kwargs):
+        return MergedQuerySet(
+            self.model,
+            {alias: getattr(queryset, method)(*args, **kwargs)
+             for alias, queryset in self.querysets.items()},
+            ordering or self.ordering,
+            self.related if related is None else related,
+        )
+
+    @property
+    def query(self):
+        for queryset in self.querysets.values():
+            return queryset.query
+        return self.model.objects.none().query
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self._clone('exclude', *args, **kwargs)
+
+    def order_by(self, *ordering):
+        return self._clone('all', ordering=ordering)
+
+    def values(self, *fields):
+        return self._clone('values', *fields, related=())
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets.values())
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets.values())
+
+    def _merge(self, stop=None):
+        """Поток объектов всех шардов в порядке self.ordering; из каждого
+        шарда читается не больше stop строк."""
+        directions = {name.startswith('-') for name in self.ordering}
+        if len(directions) != 1:
+            raise ValueError('Слияние шардов требует одного направления '
+                             f'сортировки: {self.ordering}')
+        fields = [name.lstrip('-') for name in self.ordering]
+
+        def key(obj):
+            if isinstance(obj, dict):
+                return tuple(obj[field] for field in fields)
+            return tuple(getattr(obj, field) for field in fields)
+
+        streams = [
+            queryset.order_by(*self.ordering)[:stop].iterator()
+            for queryset in self.querysets.values()
+        ]
+        return heapq.merge(*streams, key=key, reverse=directions.pop())
+
+    def _attach(self, objects):
+        """Подставляет объекты связей related из основной базы."""
+        for name in self.related:
+            field = self.model._meta.get_field(name)
+            ids = {getattr(obj, field.attname) for obj in objects} - {None}
+            related = field.related_model._base_manager.using(
+                PRIMARY).in_bulk(ids)
+            for obj in objects:
+                field.set_cached_value(
+                    obj, related.get(getattr(obj, field.attname)))
+        return objects
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if index.step or (index.start or 0) < 0 or (
+                index.stop is not None and index.stop < 0):
+            raise ValueError('Поддерживаются только срезы без шага '
+                             'и отрицательных индексов.')
+        return self._attach(list(
+            islice(self._merge(index.stop), index.start, index.stop)))
+
+    def __iter__(self):
+        objects = self._merge()
+        while True:
+            batch = self._attach(list(islice(objects, BATCH_SIZE)))
+            if not batch:
+                return
+            yield from batch
+
+    def iterator(self):
+        return iter(self)
+
+
+def _merged(queryset, querysets, ordering=None):
+    queryset, related = _split_related(queryset)
+    return MergedQuerySet(
+        queryset.model,
+        {alias: _split_related(shard_queryset)[0]
+         for alias, shard_queryset in querysets.items()},
+        ordering or _default_ordering(queryset),
+        related,
+    )
+
+
+def merged(queryset, shards=None):
+    """queryset по всем шардам (или по shards) одним списком."""
+    if not enabled() or isinstance(queryset, MergedQuerySet):
+        return queryset
+    return _merged(queryset, {
+        alias: queryset.using(alias) for alias in shards or aliases()
+    })
+
+
+def for_authors(queryset, author_ids):
+    """Посты авторов author_ids: запрос только к их шардам."""
+    if not enabled():
+        return queryset.filter(author_id__in=author_ids)
+    by_shard = defaultdict(list)
+    for author_id in author_ids:
+        by_shard[shard_for(author_id)].append(author_id)
+    return _merged(queryset, {
+        alias: queryset.filter(author_id__in=ids).using(alias)
+        for alias, ids in by_shard.items()
+    })
+
+
+def each(queryset):
+    """queryset в каждом шарде (без шардов — он сам)."""
+    if not enabled():
+        return [queryset]
+    return [queryset.using(alias) for alias in aliases()]
+
+
+def find(queryset, **lookup):
+    """Объект по lookup из шарда, в котором он лежит, или None."""
+    queryset = queryset.filter(**lookup)
+    if not enabled():
+        return queryset.first()
+    objects = _merged(queryset, {
+        alias: queryset.using(alias) for alias in aliases()
+    }, ordering=('pk',))[:1]
+    return objects[0] if objects else None
+
+
+def get_object_or_404(queryset, **lookup):
+    obj = find(queryset, **lookup)
+    if obj is None:
+        raise Http404(
+            f'No {queryset.model._meta.object_name} matches the given query.')
+    return obj
+
+
+def misplaced(alias):
+    """Авторы, чьи посты лежат в alias, но принадлежат другому шарду:
+    {author_id: шард}."""
+    author_ids = Post._base_manager.using(alias).order_by().values_list(
+        'author_id', flat=True).distinct()
+    targets = {author_id: shard_for(author_id) for author_id in author_ids}
+    return {author_id: target for author_id, target in targets.items()
+            if target != alias}
+
+
+def _copy(objects, target):
+    existing = set(type(objects[0])._base_manager.using(target).filter(
+        pk__in=[obj.pk for obj in objects]).values_list('pk', flat=True))
+    for obj in objects:
+        if obj.pk not in existing:
+            # raw: даты создания и изменения не перезаписываются,
+            # сигналы счётчиков и кеша не срабатывают
+            obj.save_base(raw=True, force_insert=True, using=target)
+
+
+def _delete(model, alias, column, values):
+    connection = connections[alias]
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+            f'WHERE {connection.ops.quote_name(column)} '
+            f'IN ({placeholders})',
+            values,
+        )
+
+
+def move_author(author_id, source, target, batch_size=BATCH_SIZE):
+    """Переносит посты автора вместе с комментариями из source в target.
+    Пачка сначала копируется, потом удаляется из source, поэтому после
+    сбоя перенос можно просто повторить. Возвращает число постов."""
+    posts = Post._base_manager.using(source).filter(
+        author_id=author_id).order_by('pk')
+    moved = 0
+    while True:
+        batch = list(posts[:batch_size])
+        if not batch:
+            return moved
+        post_ids = [post.pk for post in batch]
+        comments = list(Comment._base_manager.using(source).filter(
+            post_id__in=post_ids).order_by('pk'))
+        with transaction.atomic(using=target):
+            _copy(batch, target)
+            if comments:
+                _copy(comments, target)
+        # удаление в обход ORM: без каскада и сигналов, копия уже в target
+        with transaction.atomic(using=source):
+            _delete(Comment, source, 'post_id', post_ids)
+            _delete(Post, source, 'id', post_ids)
+        moved += len(batch)
+
+
+def rebalance(sources=None, batch_size=BATCH_SIZE, dry_run=False):
+    """Переносит посты авторов, лежащие не в своём шарде; sources —
+    базы, которые нужно проверить, включая выведенные из POST_SHARDS.
+    Возвращает {(откуда, куда): число постов}."""
+    moved = defaultdict(int)
+    for source in sources or aliases():
+        for author_id, target in misplaced(source).items():
+            if dry_run:
+                moved[source, target] += Post._base_manager.using(
+                    source).filter(author_id=author_id).count()
+            else:
+                moved[source, target] += move_author(
+                    author_id, source, target, batch_size)
+    return dict(moved)
@@ -0,0 +1,193 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core import jobs, replicas
+from users.models import Profile
+
+from . import caching, counters, search, shards, tasks, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_shard_id(sender, instance, raw=False, **kwargs):
+    # ключи общие для всех шардов: строка переезжает без смены id
+    if instance.pk is None and not raw and shards.enabled():
+        instance.pk = shards.allocate_ids(sender)[0]
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    # при переносе поста в другую группу сбросить надо и старую
+    instance._previous_group_id = None
+    if instance.pk and not instance._state.adding and not raw:
+        instance._previous_group_id = Post.objects.using(
+            instance._state.db
+        ).filter(pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_profile(instance.author_id, posts_count=1)
+    caching.bump_on_commit(*caching.post_scopes(instance, (
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    )), using=instance._state.db)
+    # ленты подписчиков — в фоне: их может быть очень много
+    jobs.enqueue(
+        tasks.refresh_follower_feeds,
+        key=f'follower-feeds:{instance.pk}',
+        post_id=instance.pk,
+        fan_out=created,
+    )
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # ленты подписчиков — до каскадного удаления, пока они известны
+    caching.bump_on_commit(
+        *caching.post_scopes(instance, (instance.group_id,)),
+        *caching.follower_scopes(instance.pk),
+        using=instance._state.db,
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, posts_count=-1)
+
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Group)
+def clean_up_shards(sender, instance, **kwargs):
+    # каскад ORM меняет строки только в базе самого объекта
+    for alias in shards.aliases():
+        if alias == instance._state.db:
+            continue
+        if sender is Group:
+            Post.objects.using(alias).filter(group=instance).update(
+                group=None)
+        else:
+            Comment.objects.using(alias).filter(author=instance).delete()
+            Post.objects.using(alias).filter(author=instance).delete()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    # ссылки на группу по slug есть и в общей ленте
+    if not raw:
+        caching.bump_on_commit('posts', f'group:{instance.pk}',
+                               using=instance._state.db)
+
+
+# поля пользователя, которые выводятся в карточках и комментариях
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _saves_name(update_fields):
+    return not update_fields or bool(set(update_fields) & set(NAME_FIELDS))
+
+
+@receiver(pre_save, sender=User)
+def remember_name(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    instance._previous_name = None
+    if (instance.pk and not instance._state.adding and not raw
+            and _saves_name(update_fields)):
+        instance._previous_name = User.objects.filter(
+            pk=instance.pk).values_list(*NAME_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    # вход пользователя меняет только last_login
+    if raw or not _saves_name(update_fields):
+        return
+    if created:
+        # новые ключи и для пользователя, получившего id удалённого
+        caching.bump_on_commit(f'author:{instance.pk}',
+                               f'follow:{instance.pk}',
+                               using=instance._state.db)
+        return
+    caching.bump_on_commit(f'author:{instance.pk}', f'user:{instance.pk}',
+                           using=instance._state.db)
+    name = tuple(getattr(instance, field) for field in NAME_FIELDS)
+    previous = getattr(instance, '_previous_name', None)
+    if previous is not None and previous != name:
+        # имя есть и в общих лентах, и в лентах подписчиков
+        jobs.enqueue(tasks.refresh_author_feeds,
+                     key=f'author-feeds:{instance.pk}',
+                     author_id=instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.bump_on_commit(f'author:{instance.user_id}',
+                               using=instance._state.db)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_comments(instance.post_id, 1, instance._state.db)
+        jobs.enqueue(tasks.notify_comment, key=f'comment:{instance.pk}',
+                     comment_id=instance.pk)
+    caching.bump_on_commit(f'post:{instance.post_id}',
+                           using=instance._state.db)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1, instance._state.db)
+    caching.bump_on_commit(f'post:{instance.post_id}',
+                           using=instance._state.db)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_profile(instance.author_id, followers_count=1)
+        counters.change_profile(instance.user_id, following_count=1)
+        caching.bump_on_commit(f'follow:{instance.user_id}',
+                               using=instance._state.db)
+        jobs.enqueue(
+            tasks.backfill_timeline,
+            key=f'backfill:{instance.user_id}:{instance.author_id}',
+            user_id=instance.user_id,
+            author_id=instance.author_id,
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    counters.change_profile(instance.author_id, followers_count=-1)
+    counters.change_profile(instance.user_id, following_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    if timeline.dropped_to_threshold(instance.author_id):
+        jobs.enqueue(tasks.backfill_followers,
+                     key=f'backfill-followers:{instance.author_id}',
+                     author_id=instance.author_id)
+    caching.bump_on_commit(f'follow:{instance.user_id}',
+                           using=instance._state.db)
+
+
+@receiver(replicas.synced)
+def replica_synced(sender, alias, **kwargs):
+    # собранное с отставшей реплики под свежими версиями лент
+    caching.bump(f'replica:{alias}')
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using='default', **kwargs):
+    # пересоздание posts_post миграцией удаляет триггеры FTS-индекса
+    if sender.name == 'posts':
+        search.ensure_triggers(connections[using])
@@ -0,0 +1,121 @@
+"""Фоновые задачи постов (очередь core.jobs).
+
+Счётчики и версии кеша самого поста, автора и группы меняются сразу в
+запросе — это дёшево и нужно, чтобы автор увидел свою запись. Всё, что
+растёт с числом подписчиков или постов, и работа с картинками уходит
+сюда.
+"""
+from itertools import chain
+
+from django.core.mail import send_mail
+from django.utils.dateparse import parse_datetime
+
+from core import jobs
+
+from . import (caching, counters, digests, images, shards, thumbnails,
+               timeline)
+from .models import Comment, Follow, Post, User
+from .utils import absolute_url
+
+
+@jobs.task
+def process_image(name):
+    """Нормализует картинку и создаёт её миниатюры."""
+    thumbnails.generate(images.normalize(name).name)
+
+
+def schedule_image(post):
+    """Ставит в очередь обработку картинки поста."""
+    if post.image:
+        name = post.image.name
+        jobs.enqueue(process_image, key=f'image:{name}', name=name)
+
+
+@jobs.task
+def refresh_follower_feeds(post_id, fan_out=False):
+    """Разносит новый пост по лентам подписчиков и сбрасывает кеш
+    лент, в которые он попал."""
+    post = shards.find(
+        Post.objects.only('pk', 'author_id', 'pub_date'), pk=post_id)
+    if post is None:
+        return
+    if fan_out:
+        timeline.fan_out_post(post)
+    caching.bump_followers(post_id)
+
+
+@jobs.task
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту нового подписчика посты автора."""
+    # пока задача ждала, пользователь мог успеть отписаться
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+        caching.bump(f'follow:{user_id}')
+
+
+@jobs.task
+def backfill_followers(author_id):
+    """Разносит посты автора, опустившегося до порога разноса, по лентам
+    всех его подписчиков."""
+    followers = timeline.backfill_followers(author_id)
+    caching.bump_many(f'follow:{user_id}' for user_id in followers)
+
+
+@jobs.task
+def refresh_author_feeds(author_id):
+    """Сбрасывает ленты и комментарии, в которых выводится имя автора,
+    после его смены."""
+    group_ids, post_ids = set(), set()
+    for posts in shards.each(Post.objects.filter(author_id=author_id)):
+        group_ids.update(posts.exclude(group=None).order_by().values_list(
+            'group_id', flat=True).distinct())
+    for comments in shards.each(Comment.objects.filter(author_id=author_id)):
+        post_ids.update(comments.order_by().values_list(
+            'post_id', flat=True).distinct())
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True).iterator()
+    caching.bump_many(chain(
+        ['posts'],
+        (f'group:{group_id}' for group_id in group_ids),
+        (f'post:{post_id}' for post_id in post_ids),
+        (f'follow:{user_id}' for user_id in followers),
+    ))
+
+
+@jobs.task
+def notify_comment(comment_id):
+    """Письмо автору поста о новом комментарии."""
+    comment = shards.find(
+        Comment.objects.select_related('post__author', 'author'),
+        pk=comment_id)
+    if comment is None:
+        return
+    recipient = comment.post.author
+    if not recipient.email or recipient == comment.author:
+        return
+    url = absolute_url('posts:post_detail', post_id=comment.post_id)
+    send_mail(
+        f'Новый комментарий к посту «{comment.post}»',
+        f'{comment.author.username} пишет:\n\n{comment.text}\n\n{url}',
+        None,
+        [recipient.email],
+    )
+
+
+@jobs.task
+def reconcile_profiles(user_ids):
+    counters.reconcile_profiles(user_ids)
+
+
+@jobs.task
+def reconcile_comments(post_ids):
+    counters.reconcile_comments(post_ids)
+
+
+@jobs.task
+def send_digest_batch(user_ids, until):
+    """Дайджесты пачке подписчиков за посты до until (ISO 8601)."""
+    users = list(User.objects.filter(pk__in=user_ids).exclude(
+        email='').order_by('pk').values_list('pk', 'email'))
+    if users:
+        digests.send_batch(users, parse_datetime(until))
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import caching
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы: {% post_cards page_obj as cards %}."""
+    return caching.post_cards(posts)
@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+# ширина картинки в карточке ленты: во всю ширину контейнера bootstrap
+FEED_SIZES = '(min-width: 1200px) 1110px, 100vw'
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes=FEED_SIZES):
+    """Миниатюра картинки поста со всеми готовыми вариантами ширины
+    в srcset, если она уже создана, иначе заглушка."""
+    variants = thumbnails.ready_variants(post.image)
+    return {
+        'post': post,
+        'thumbnail': dict(variants).get(thumbnails.DEFAULT_WIDTH),
+        'variants': variants,
+        'sizes': sizes,
+        'width': thumbnails.DEFAULT_WIDTH,
+        'height': round(thumbnails.DEFAULT_WIDTH / thumbnails.ASPECT_RATIO),
+    }
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import search
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Сниппет найденного поста с подсвеченными словами запроса."""
+    return search.highlight(snippet)
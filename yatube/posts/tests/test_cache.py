@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -8,7 +9,10 @@ from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from ..models import Group, Post
+from core.testing import on_commit_callbacks
+
+from .. import caching
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -16,8 +20,8 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class CacheViwesTest(TestCase):
-    """При удалении записи из базы, она остаётся в response.content главной
-    страницы до тех пор, пока кэш не будет очищен"""
+    """Лента отдаётся из кеша, пока её содержимое не изменится; изменение
+    поста через модель сразу сбрасывает закешированные страницы"""
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -39,6 +43,7 @@ class CacheViwesTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
 
     def test_index_page_cache(self):
         created_post = Post.objects.filter(pk=CacheViwesTest.post.pk)
@@ -50,15 +55,119 @@ class CacheViwesTest(TestCase):
                                                             ].object_list,
                       'Пост отсутствует на главной странице')
         page_content = response.content
-        CacheViwesTest.post.delete()
+        # update() минует сигналы: страница должна прийти из кеша
+        created_post.update(text='Текст, которого нет в кеше')
+        page_content_cached = self.guest_client.get(
+            reverse('posts:posts')).content
+        self.assertEqual(page_content, page_content_cached,
+                         'Кеширование не работает')
+        with on_commit_callbacks():
+            CacheViwesTest.post.delete()
         self.assertFalse(created_post.exists(),
                          'Пост не удален в базе данных')
         page_content_after_delete = self.guest_client.get(
             reverse('posts:posts')).content
-        self.assertEqual(page_content, page_content_after_delete,
-                         'Кеширование не работает')
+        self.assertNotEqual(page_content, page_content_after_delete,
+                            'Удаление поста не сбросило кеш')
+        self.assertNotIn(CacheViwesTest.post.text.encode(),
+                         page_content_after_delete)
+
+    def test_feed_pages_invalidated_by_new_post(self):
+        urls = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author_user}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        with on_commit_callbacks():
+            Post.objects.create(
+                text='Свежий пост', author=self.author_user,
+                group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_follow_page_invalidated_by_new_post(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author_user)
+        self.guest_client.force_login(reader)
+        url = reverse('posts:follow_index')
+        self.assertNotContains(self.guest_client.get(url), 'Свежий пост')
+        Post.objects.create(text='Свежий пост', author=self.author_user)
+        self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_versions_change_after_commit(self):
+        """Версия ленты меняется только после коммита записи: иначе
+        параллельный запрос закешировал бы под ней старые строки"""
+        version = caching.get_version('posts')
+        with on_commit_callbacks():
+            Post.objects.create(text='Пост', author=self.author_user)
+            self.assertEqual(caching.get_version('posts'), version)
+        self.assertNotEqual(caching.get_version('posts'), version)
+
+    def test_post_detail_comments_invalidated_by_comment(self):
+        post = Post.objects.create(text='Пост', author=self.author_user)
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        self.assertNotContains(self.guest_client.get(url), 'Комментарий')
+        with on_commit_callbacks():
+            Comment.objects.create(
+                post=post, author=self.author_user, text='Комментарий')
+        self.assertContains(self.guest_client.get(url), 'Комментарий')
+
+
+class PostCardCacheTest(TestCase):
+    """Карточка поста рендерится один раз для всех лент, где он выводится,
+    и заново — только после изменения поста"""
+    def setUp(self):
         cache.clear()
-        page_content_after_cache_clear = self.guest_client.get(
-            reverse('posts:posts')).content
-        self.assertNotEqual(page_content_after_delete,
-                            page_content_after_cache_clear)
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.post = Post.objects.create(
+            text='Старый текст', author=self.author, group=self.group)
+
+    def rendered_cards(self, *urls):
+        with mock.patch.object(
+                caching, 'render_to_string',
+                wraps=caching.render_to_string) as render:
+            for url in urls:
+                self.client.get(url)
+        return render.call_count
+
+    def test_card_is_shared_between_feeds(self):
+        feeds = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        self.assertEqual(self.rendered_cards(*feeds), 1)
+
+    def test_edit_renders_new_card(self):
+        self.client.force_login(self.author)
+        self.client.get(reverse('posts:posts'))
+        with on_commit_callbacks():
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+                data={'text': 'Новый текст', 'group': self.group.pk},
+            )
+        self.assertEqual(self.rendered_cards(reverse('posts:posts')), 1)
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+
+    def test_author_rename_renders_new_card(self):
+        self.client.get(reverse('posts:posts'))
+        with on_commit_callbacks():
+            self.author.first_name = 'Лев'
+            self.author.last_name = 'Толстой'
+            self.author.save()
+        self.assertEqual(self.rendered_cards(reverse('posts:posts')), 1)
+        self.assertContains(self.client.get(
+            reverse('posts:profile', kwargs={'username': self.author})),
+            'Лев Толстой')
+        # новый пост автора не заставляет заново рендерить старые карточки
+        with on_commit_callbacks():
+            Post.objects.create(text='Ещё пост', author=self.author)
+        self.assertEqual(self.rendered_cards(reverse('posts:posts')), 1)
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentsPageTest(TestCase):
+    """Комментарии выводятся порциями, авторы — тем же запросом"""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        users = [
+            User.objects.create_user(username=f'user{i}') for i in range(4)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=users[i % 4], text=f'Комментарий {i}')
+            for i in range(8)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comments(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:3])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+        response = self.client.get(url, {'cursor': comments.next_cursor})
+        self.assertEqual(
+            list(response.context['comments']), self.comments[3:6])
+
+    def test_comments_api_loads_the_rest(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        cursor = ''
+        with self.assertNumQueries(3 * 2):
+            while cursor is not None:
+                data = self.client.get(url, {'cursor': cursor}).json()
+                seen.extend(comment['id'] for comment in data['results'])
+                cursor = data['next']
+        self.assertEqual(seen, [comment.pk for comment in self.comments])
+        self.assertEqual(data['results'][-1]['author'], 'user3')
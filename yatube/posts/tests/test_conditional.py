@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.testing import on_commit_callbacks
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    """Неизменившиеся страницы перепроверяются ответом 304 без
+    рендеринга шаблона"""
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group)
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        urls = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # первый ответ с формой выставляет CSRF-cookie, а она
+                # входит в ETag
+                self.client.get(url)
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                revalidated = self.revalidate(url, response)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated.content, b'')
+                self.assertTemplateNotUsed(revalidated, 'base.html')
+                revalidated = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(revalidated.status_code, 304)
+
+    def test_changes_invalidate_pages(self):
+        index = reverse('posts:posts')
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        profile = reverse('posts:profile', kwargs={'username': self.author})
+        responses = {url: self.client.get(url)
+                     for url in (index, detail, profile)}
+        with on_commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.revalidate(index, responses[index]).status_code,
+                         200)
+        self.assertEqual(
+            self.revalidate(detail, responses[detail]).status_code, 200)
+        responses[detail] = self.client.get(detail)
+        with on_commit_callbacks():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')
+        self.assertEqual(
+            self.revalidate(detail, responses[detail]).status_code, 200)
+        responses[profile] = self.client.get(profile)
+        with on_commit_callbacks():
+            Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(profile, responses[profile]).status_code, 200)
+
+    def test_author_rename_invalidates_pages(self):
+        urls = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            self.client.get(url)
+        responses = {}
+        for url in urls:
+            responses[url] = self.client.get(url)
+            self.assertEqual(
+                self.revalidate(url, responses[url]).status_code, 304)
+        with on_commit_callbacks():
+            self.author.first_name = 'Новое имя'
+            self.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, responses[url]).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = reverse('posts:posts')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response, Client()).status_code,
+                         200)
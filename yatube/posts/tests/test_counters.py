@@ -0,0 +1,123 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import jobs
+from users.models import Profile
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CounterTest(TestCase):
+    """Денормализованные счётчики постов, подписок и комментариев"""
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+
+    def test_delete_with_zero_counters(self):
+        """Заниженный счётчик не ломает удаление и не уходит в минус"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Profile.objects.update(
+            posts_count=0, followers_count=0, following_count=0)
+        Post.objects.update(comments_count=0)
+        comment.delete()
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+
+    def test_missing_profile_is_created_with_actual_counts(self):
+        """Недостающий профиль получает реальные счётчики, а не дельту"""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author) for i in range(3))
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(user=self.author).delete()
+        Post.objects.create(text='Новый пост', author=self.author)
+        profile = self.profile(self.author)
+        self.assertEqual(profile.posts_count, 4)
+        self.assertEqual(profile.followers_count, 1)
+
+    def test_post_save_keeps_counters(self):
+        """Сохранение устаревшего объекта не затирает счётчик"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_profile_page_does_not_count_posts(self):
+        Post.objects.create(text='Пост', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertEqual(response.context['post_counter'], 1)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_reconcile_command_fixes_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        # bulk_create и update идут в обход сигналов
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author) for i in range(3))
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.reader, text='Текст')])
+        Profile.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertIn('профилей: 2, постов: 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.profile(self.author).posts_count, 4)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_reconcile_command_can_defer_to_queue(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.reader, text='Текст')])
+        out = StringIO()
+        call_command('reconcile_counters', defer=True, stdout=out)
+        self.assertIn('пачек: 2', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        jobs.run_pending()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from users.models import Profile
+
+from .. import digests
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class DigestTest(TestCase):
+    """Дайджесты новых постов подписок"""
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.readers = [
+            User.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@example.com')
+            for i in range(3)
+        ]
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        # без почты и без подписок писем не получают
+        Follow.objects.create(
+            user=User.objects.create_user(username='noemail'),
+            author=self.author)
+        User.objects.create_user(username='lonely', email='l@example.com')
+        self.now = timezone.now()
+
+    def post(self, text, author=None, hours_ago=1):
+        post = Post.objects.create(text=text, author=author or self.author)
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=self.now - timedelta(hours=hours_ago))
+        return post
+
+    @override_settings(SITE_URL='http://yatube.example/')
+    def test_digest_sent_in_batches_over_one_connection(self):
+        fresh = self.post('Свежий пост')
+        self.post('Вчерашний пост', hours_ago=30)
+        self.post('Чужой пост', author=self.other)
+        with mock.patch('posts.digests.get_connection',
+                        wraps=digests.get_connection) as get_connection:
+            self.assertEqual(digests.send_digests(batch_size=1), 3)
+        get_connection.assert_called_once()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [reader.email for reader in self.readers])
+        body = mail.outbox[0].body
+        self.assertIn('Свежий пост', body)
+        self.assertNotIn('Вчерашний пост', body)
+        self.assertNotIn('Чужой пост', body)
+        self.assertIn(f'http://yatube.example/posts/{fresh.pk}/', body)
+        # уже разосланное не повторяется
+        self.assertEqual(digests.send_digests(), 0)
+
+    def test_digest_since_last_sent(self):
+        Profile.objects.filter(user=self.readers[0]).update(
+            last_digest_at=self.now - timedelta(hours=2))
+        Profile.objects.filter(user=self.readers[1]).update(
+            last_digest_at=self.now - timedelta(hours=48))
+        self.post('Пост час назад')
+        self.post('Пост три часа назад', hours_ago=3)
+        digests.send_digests()
+        bodies = {message.to[0]: message.body for message in mail.outbox}
+        self.assertNotIn('три часа', bodies[self.readers[0].email])
+        self.assertIn('три часа', bodies[self.readers[1].email])
+
+    @override_settings(DIGEST_MAX_POSTS=2)
+    def test_digest_capped(self):
+        for i in range(5):
+            self.post(f'Пост {i}')
+        digests.send_digests()
+        self.assertIn('И ещё постов: 3', mail.outbox[0].body)
+
+    @override_settings(JOBS_EAGER=False)
+    def test_command_defer(self):
+        self.post('Свежий пост')
+        out = StringIO()
+        call_command('send_digests', '--defer', '--batch-size=2', stdout=out)
+        self.assertIn('Поставлено в очередь пачек: 2', out.getvalue())
+        self.assertEqual(mail.outbox, [])
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 3)
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
@@ -11,6 +12,7 @@ User = get_user_model()
 class FollowTest(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client_auth = Client()
         self.user1 = User.objects.create_user(username='Test_name1')
         self.user2 = User.objects.create_user(username='Test_name2')
@@ -0,0 +1,96 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import metrics
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=100, exif=exif.tobytes())
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_FORMAT='JPEG',
+                   IMAGE_MAX_SIZE=(800, 800), IMAGE_QUALITY=75)
+class NormalizeImageTest(TestCase):
+    """Загруженные картинки уменьшаются и перекодируются без EXIF"""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.registry = metrics.Registry()
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, content, name='photo.jpg'):
+        return Post.objects.create(
+            text='Пост', author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/jpeg'))
+
+    def test_large_photo_is_resized_and_stripped(self):
+        # ориентация 6: снимок нужно повернуть на 90°
+        post = self.create_post(make_jpeg((2400, 1200), orientation=6))
+        original = post.image.name
+        result = images.normalize(original)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, result.name)
+        self.assertTrue(result.name.endswith('.jpg'))
+        self.assertFalse(default_storage.exists(original))
+        self.assertLess(result.stored_size, result.original_size)
+        with default_storage.open(result.name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (400, 800))
+            self.assertNotIn('exif', image.info)
+            self.assertTrue(image.info.get('progressive'))
+        self.assertEqual(self.registry.image_bytes.series[
+            (('stage', 'stored'),)], result.stored_size)
+
+    def test_small_clean_image_is_kept(self):
+        image = Image.new('RGB', (100, 100), 'red')
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=50)
+        post = self.create_post(output.getvalue())
+        result = images.normalize(post.image.name)
+        self.assertEqual(result.name, post.image.name)
+        self.assertTrue(default_storage.exists(post.image.name))
+
+    @override_settings(IMAGE_FORMAT='WEBP')
+    def test_webp_falls_back_to_jpeg_without_codec(self):
+        with mock.patch.object(images.features, 'check', return_value=False):
+            self.assertEqual(images.output_format(), 'JPEG')
+
+    def test_command_reports_savings(self):
+        self.create_post(make_jpeg((2400, 1200)))
+        output = io.StringIO()
+        with mock.patch('posts.thumbnails.generate') as generate:
+            call_command('normalize_images', stdout=output)
+        generate.assert_called_once()
+        self.assertIn('Нормализовано картинок: 1 из 1', output.getvalue())
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам: без полного просмотра таблиц
+    и без сортировки во временном B-дереве"""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group)
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'posts_' not in sql:
+                continue
+            for step in self.query_plan(sql):
+                with self.subTest(url=url, sql=sql):
+                    self.assertNotIn('TEMP B-TREE', step)
+                    if step.startswith('SCAN'):
+                        self.assertIn('INDEX', step)
+
+    def test_feed_queries_use_indexes(self):
+        feeds = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in feeds:
+            self.assertUsesIndexes(url)
+            self.assertUsesIndexes(f'{url}?cursor=')
+        self.assertUsesIndexes(reverse('posts:follow_index'))
+        self.assertUsesIndexes(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
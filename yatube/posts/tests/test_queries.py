@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов к базе на странице ленты
+    не зависит от количества постов на странице"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        cache.clear()
+
+    def create_posts(self, count):
+        for i in range(count):
+            Post.objects.create(
+                text=f'Тестовый пост {i}',
+                author=self.author,
+                group=self.group,
+            )
+
+    def feed_urls(self):
+        return (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return len(context)
+
+    def test_feed_query_count_is_constant(self):
+        self.create_posts(1)
+        baseline = {url: self.count_queries(url) for url in self.feed_urls()}
+        self.create_posts(9)
+        for url, expected in baseline.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(expected):
+                    response = self.client.get(url)
+                self.assertEqual(len(response.context['page_obj']), 10)
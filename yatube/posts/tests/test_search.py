@@ -0,0 +1,85 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    """Полнотекстовый поиск по постам"""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.best = Post.objects.create(
+            text='Котики и снова котики', author=cls.author, group=cls.group)
+        cls.worse = Post.objects.create(
+            text='Про котиков и собак, а ещё про погоду и прочее',
+            author=cls.other,
+        )
+        Post.objects.create(text='Про собак', author=cls.author)
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:post_search'), params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.found(q='котики'), [self.best.pk])
+        self.assertEqual(self.found(q='КОТИК'), [self.best.pk, self.worse.pk])
+
+    def test_index_follows_text_changes(self):
+        Post.objects.filter(pk=self.best.pk).update(text='Про хомяков')
+        self.assertEqual(self.found(q='котик'), [self.worse.pk])
+        self.assertEqual(self.found(q='хомяков'), [self.best.pk])
+        Post.objects.filter(pk=self.best.pk).delete()
+        self.assertEqual(self.found(q='хомяков'), [])
+
+    def test_filters(self):
+        self.assertEqual(self.found(q='котик', group='group'), [self.best.pk])
+        self.assertEqual(
+            self.found(q='котик', author='other'), [self.worse.pk])
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('"', 'котик OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:post_search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        Post.objects.create(
+            text='<script>alert(1)</script> пингвин', author=self.author)
+        response = self.client.get(
+            reverse('posts:post_search_api'), {'q': 'пингвин'})
+        snippet = response.json()['results'][0]['snippet']
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('<mark>пингвин</mark>', snippet)
+
+    def test_api_keyset_pagination(self):
+        Post.objects.bulk_create(
+            Post(text=f'Погода {i}', author=self.author) for i in range(25))
+        url = reverse('posts:post_search_api')
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            data = self.client.get(url, {'q': 'погода', 'cursor': cursor})
+            data = data.json()
+            seen.extend(result['id'] for result in data['results'])
+            cursor = data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_admin_uses_fts_index(self):
+        model_admin = admin.site._registry[Post]
+        request = RequestFactory().get('/')
+        queryset, duplicates = model_admin.get_search_results(
+            request, Post.objects.all(), 'собак')
+        self.assertFalse(duplicates)
+        self.assertIn(search.FTS_TABLE, str(queryset.query))
+        self.assertEqual(queryset.count(), 2)
@@ -0,0 +1,224 @@
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.db import retry_on_locked
+from users.models import Profile
+
+from .. import shards
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SHARDS = ['default', 'shard1']
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardTest(TransactionTestCase):
+    """Посты и комментарии в шардах по автору"""
+    databases = set(SHARDS)
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.reader = User.objects.create_user(username='reader')
+        # по автору на каждый шард
+        self.authors = {}
+        number = 0
+        while len(self.authors) < len(SHARDS):
+            user = User.objects.create_user(username=f'author{number}')
+            self.authors.setdefault(shards.shard_for(user.pk), user)
+            number += 1
+        self.client.force_login(self.reader)
+
+    def create_posts(self, count):
+        """count постов попеременно в каждом шарде, новые — раньше в
+        списке."""
+        now = timezone.now()
+        posts = []
+        for number in range(count):
+            author = self.authors[SHARDS[number % len(SHARDS)]]
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author, group=self.group)
+            post.pub_date = now - timedelta(minutes=number)
+            Post.objects.using(post._state.db).filter(pk=post.pk).update(
+                pub_date=post.pub_date)
+            posts.append(post)
+        return posts
+
+    def page_ids(self, response):
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_posts_and_comments_placed_by_author(self):
+        posts = {alias: Post.objects.create(text='Пост', author=author)
+                 for alias, author in self.authors.items()}
+        for alias, post in posts.items():
+            self.assertEqual(post._state.db, alias)
+            self.assertTrue(
+                Post.objects.using(alias).filter(pk=post.pk).exists())
+        self.assertEqual(len({post.pk for post in posts.values()}), 2)
+
+        post = posts['shard1']
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'})
+        comment = Comment.objects.using('shard1').get()
+        self.assertEqual(comment.post_id, post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertFalse(Comment.objects.using('default').exists())
+
+    def test_lock_retry_rolls_back_shard_rows(self):
+        author = self.authors['shard1']
+        attempts = []
+
+        @retry_on_locked(delay=0)
+        def create_post():
+            Post.objects.create(text='Пост', author=author)
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        create_post()
+        self.assertEqual(Post.objects.using('shard1').count(), 1)
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 1)
+
+    def test_reconcile_counts_posts_and_comments_in_shards(self):
+        author = self.authors['shard1']
+        post = Post.objects.create(text='Пост', author=author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Profile.objects.filter(user=author).update(posts_count=0)
+        Post.objects.using('shard1').update(comments_count=0)
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('профилей: 1, постов: 1', out.getvalue())
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_global_feeds_merge_shards(self):
+        posts = self.create_posts(15)
+        expected = [post.pk for post in posts]
+        for url in (reverse('posts:posts'),
+                    reverse('posts:group_list', kwargs={'slug': 'group'})):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connections['shard1']) as queries:
+                    first = self.client.get(url)
+                self.assertEqual(self.page_ids(first), expected[:10])
+                # из шарда читается не больше строк, чем на странице
+                self.assertTrue(any('LIMIT 10' in query['sql']
+                                    for query in queries))
+                self.assertEqual(first.context['page_obj'].paginator.count,
+                                 15)
+                # автор и группа подставлены из основной базы
+                page = first.context['page_obj']
+                self.assertEqual(page[0].author, posts[0].author)
+                self.assertEqual(page[1].group, self.group)
+                second = self.client.get(url, {'page': 2})
+                self.assertEqual(self.page_ids(second), expected[10:])
+
+        first = self.client.get(reverse('posts:posts'), {'cursor': ''})
+        self.assertEqual(self.page_ids(first), expected[:10])
+        second = self.client.get(reverse('posts:posts'), {
+            'cursor': first.context['page_obj'].next_cursor})
+        self.assertEqual(self.page_ids(second), expected[10:])
+
+    def test_follow_feed_reads_followed_authors_shards(self):
+        posts = self.create_posts(4)
+        followed = self.authors['shard1']
+        Follow.objects.create(user=self.reader, author=followed)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            self.page_ids(response),
+            [post.pk for post in posts if post.author == followed])
+
+    def test_post_pages_find_sharded_post(self):
+        author = self.authors['shard1']
+        post = Post.objects.create(text='Пост в шарде', author=author)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'Пост в шарде')
+        self.assertEqual(response.context['author'], author)
+        self.client.force_login(author)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Исправленный пост'})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': 0})
+        ).status_code, 404)
+
+    def test_import_and_export_use_author_shards(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'posts.jsonl')
+        with open(source, 'w', encoding='utf-8') as file:
+            for number in range(6):
+                author = self.authors[SHARDS[number % len(SHARDS)]]
+                file.write(
+                    f'{{"text": "Пост {number}", "author": "{author}", '
+                    f'"group": "group"}}\n')
+        call_command('import_posts', source, batch_size=4,
+                     stdout=StringIO(), stderr=StringIO())
+        ids = []
+        for alias, author in self.authors.items():
+            posts = Post.objects.using(alias)
+            self.assertEqual(posts.count(), 3)
+            self.assertFalse(posts.exclude(author=author).exists())
+            ids += posts.values_list('pk', flat=True)
+        self.assertEqual(len(set(ids)), 6)
+        self.assertEqual(
+            Profile.objects.get(user=self.authors['shard1']).posts_count, 3)
+
+        target = os.path.join(directory, 'export.jsonl')
+        call_command('export_posts', target, batch_size=2,
+                     stdout=StringIO(), stderr=StringIO())
+        with open(target, encoding='utf-8') as file:
+            self.assertEqual(len(file.readlines()), 6)
+        author = self.authors['shard1']
+        call_command('export_posts', target, author=author.username,
+                     group='group', stdout=StringIO(), stderr=StringIO())
+        with open(target, encoding='utf-8') as file:
+            lines = file.readlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(f'"{author}"' in line for line in lines))
+
+    def test_rebalance_moves_posts_with_comments(self):
+        author = self.authors['shard1']
+        with self.settings(POST_SHARDS=['default']):
+            post = Post.objects.create(text='Старый пост', author=author)
+            Comment.objects.create(
+                post=post, author=self.reader, text='Комментарий')
+        pub_date = Post.objects.using('default').get(pk=post.pk).pub_date
+
+        out = StringIO()
+        call_command('rebalance_shards', '--dry-run', stdout=out)
+        self.assertIn('default -> shard1: 1', out.getvalue())
+        self.assertTrue(Post.objects.using('default').exists())
+
+        call_command('rebalance_shards', stdout=StringIO())
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertFalse(Comment.objects.using('default').exists())
+        moved = Post.objects.using('shard1').get(pk=post.pk)
+        self.assertEqual(moved.pub_date, pub_date)
+        self.assertEqual(moved.comments_count, 1)
+        self.assertEqual(
+            Comment.objects.using('shard1').get().post_id, post.pk)
+        # перенос не меняет счётчиков
+        self.assertEqual(Profile.objects.get(user=author).posts_count, 1)
+
+        out = StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('Перенесено постов: 0', out.getvalue())
@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import jobs
+from core.models import Job
+
+from ..models import Comment, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=False)
+class DeferredSideEffectsTest(TestCase):
+    """Побочные эффекты записи выполняются воркером очереди"""
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com')
+        self.reader = User.objects.create_user(username='reader')
+        self.client.force_login(self.reader)
+
+    def queued(self):
+        return sorted(Job.objects.values_list('name', flat=True))
+
+    def test_post_fan_out_waits_for_worker(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        jobs.run_pending()
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        post.text = 'Исправленный пост'
+        post.save()
+        # правка до выполнения задачи не добавляет вторую
+        self.assertEqual(self.queued(), ['posts.tasks.refresh_follower_feeds'])
+        self.assertFalse(TimelineEntry.objects.exists())
+        jobs.run_pending()
+        self.assertContains(
+            self.client.get(reverse('posts:follow_index')),
+            'Исправленный пост')
+
+    def test_follow_backfill_skipped_after_unfollow(self):
+        Post.objects.create(text='Старый пост', author=self.author)
+        jobs.run_pending()
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.queued(), ['posts.tasks.backfill_timeline'])
+        follow.delete()
+        jobs.run_pending()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(SITE_URL='http://yatube.example')
+    def test_comment_notifies_post_author(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        jobs.run_pending()
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Отличный пост'})
+        self.assertEqual(mail.outbox, [])
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('Отличный пост', mail.outbox[0].body)
+        self.assertIn(f'http://yatube.example/posts/{post.pk}/',
+                      mail.outbox[0].body)
+        # свои комментарии автору не пересылаются
+        Comment.objects.create(post=post, author=self.author, text='Спасибо')
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 1)
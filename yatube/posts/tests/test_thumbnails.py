@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import tasks, thumbnails
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    """Миниатюры создаются вне запроса, до этого выводится заглушка"""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self):
+        return SimpleUploadedFile(
+            name='small.gif', content=SMALL_GIF, content_type='image/gif')
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=self.upload())
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with mock.patch.object(
+                thumbnails.backend, 'get_thumbnail') as get_thumbnail:
+            response = self.client.get(url)
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+
+        thumbnails.generate(post.image.name)
+        thumbnail = thumbnails.ready_thumbnail(post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+        for url in (url, reverse('posts:posts')):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), thumbnail.url)
+
+    def test_variants_in_srcset(self):
+        post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=self.upload())
+        thumbnails.generate(post.image.name)
+        variants = dict(thumbnails.ready_variants(post.image))
+        # маленький оригинал не растягивается до 1920
+        self.assertEqual(list(variants), [320, 640, 960])
+        self.assertEqual(list(variants[320].size), [320, 113])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, f'{variants[320].url} 320w')
+        self.assertContains(response, f'{variants[960].url} 960w')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertEqual(thumbnails.variant_widths(4000),
+                         [320, 640, 960, 1920])
+
+    def test_upload_schedules_thumbnail(self):
+        with mock.patch.object(tasks, 'schedule_image') as schedule:
+            self.client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост', 'image': self.upload()},
+            )
+        schedule.assert_called_once_with(Post.objects.get(text='Пост'))
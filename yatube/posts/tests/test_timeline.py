@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Материализованная лента подписок"""
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.client.force_login(self.reader)
+
+    def timeline_posts(self):
+        return set(TimelineEntry.objects.filter(
+            user=self.reader).values_list('post_id', flat=True))
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertEqual(self.timeline_posts(), {post.pk})
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.timeline_posts(), {post.pk})
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertEqual(self.timeline_posts(), set())
+
+    def test_post_delete_removes_timeline_entries(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.force_login(self.author)
+        self.client.get(reverse(
+            'posts:post_delete',
+            kwargs={'username': self.author, 'post_id': post.pk}))
+        self.assertEqual(self.timeline_posts(), set())
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=0)
+    def test_popular_author_is_read_on_request(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertEqual(self.timeline_posts(), set())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=1)
+    def test_unfollow_below_threshold_backfills_followers(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline_posts(), set())
+        Follow.objects.get(user=other).delete()
+        self.assertEqual(self.timeline_posts(), {post.pk})
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_feed_merges_timeline_and_pulled_authors(self):
+        popular = User.objects.create_user(username='popular')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=popular)
+        posts = [
+            Post.objects.create(text='Пост автора', author=self.author),
+            Post.objects.create(text='Пост популярного', author=popular),
+        ]
+        with self.settings(TIMELINE_FANOUT_THRESHOLD=0):
+            self.assertEqual(
+                set(timeline.get_feed(self.reader)), set(posts))
+
+    def test_rebuild_timelines_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            [Post(text=f'Пост {i}', author=self.author) for i in range(3)]
+        )
+        self.assertEqual(self.timeline_posts(), set())
+        call_command(
+            'rebuild_timelines', '--batch-size=2', stdout=StringIO()
+        )
+        self.assertEqual(
+            self.timeline_posts(),
+            set(Post.objects.values_list('pk', flat=True))
+        )
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from users.models import Profile
+
+from ..models import Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TransferCommandsTest(TestCase):
+    """Потоковый импорт и экспорт постов"""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, name, content):
+        with open(self.path(name), 'w', encoding='utf-8') as file:
+            file.write(content)
+        return self.path(name)
+
+    def test_import_jsonl(self):
+        path = self.write('posts.jsonl', '\n'.join((
+            '{"text": "Первый", "author": "author", "group": "group", '
+            '"pub_date": "2020-01-02T03:04:05+00:00"}',
+            '{"text": "Второй", "author": "newcomer"}',
+            '{"text": "Без автора", "author": "nobody"}',
+            '{"text": "Третий", "author": "author", "group": "unknown"}',
+        )))
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, batch_size=2,
+                     stdout=out, stderr=err)
+        self.assertIn('Загружено постов: 1, пропущено: 3', out.getvalue())
+        self.assertIn('Запись 3 пропущена', err.getvalue())
+        post = Post.objects.get(text='Первый')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(Profile.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    def test_broken_file_finishes_imported_batches(self):
+        path = self.write('posts.jsonl', '\n'.join((
+            '{"text": "Первый", "author": "author"}',
+            '{"text": "Оборванная запись',
+        )))
+        with self.assertRaises(CommandError):
+            call_command('import_posts', path, batch_size=1,
+                         stdout=StringIO(), stderr=StringIO())
+        post = Post.objects.get(text='Первый')
+        self.assertEqual(Profile.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    def test_import_creates_authors_and_groups(self):
+        path = self.write('posts.csv', (
+            'text,author,group,pub_date,image\n'
+            'Пост,newcomer,new-group,,\n'
+        ))
+        call_command('import_posts', path, create_authors=True,
+                     create_groups=True, stdout=StringIO(), stderr=StringIO())
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'new-group')
+
+    def test_export_import_round_trip(self):
+        for i in range(5):
+            Post.objects.create(
+                text=f'Пост {i}', author=self.author, group=self.group)
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(format=fmt):
+                path = self.path(f'posts.{fmt}')
+                call_command('export_posts', path, batch_size=2,
+                             stdout=StringIO(), stderr=StringIO())
+                exported = list(Post.objects.order_by('pk').values_list(
+                    'text', 'author', 'group', 'pub_date'))
+                Post.objects.all().delete()
+                call_command('import_posts', path, stdout=StringIO(),
+                             stderr=StringIO())
+                self.assertEqual(
+                    list(Post.objects.order_by('pk').values_list(
+                        'text', 'author', 'group', 'pub_date')),
+                    exported)
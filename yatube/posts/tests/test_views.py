@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from ..models import Group, Post
 
@@ -177,3 +180,87 @@ class PaginatorViewsTest(TestCase):
         response = self.client.get(reverse('posts:group_list',
                                            kwargs={'slug': 'test-slug'}))
         self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    """проверка курсорного пагинатора (?cursor=)"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(
+                author=cls.auth,
+                text=f'Тестовый текст {i} поста',
+                group=cls.group
+            ) for i in range(1, 14)])
+        # одинаковое время публикации: порядок держится на id
+        Post.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.auth)
+
+    def get_page(self, url, cursor=''):
+        cache.clear()
+        return self.client.get(url, {'cursor': cursor}).context['page_obj']
+
+    def test_cursor_pages_cover_feed_without_duplicates(self):
+        urls = (
+            reverse('posts:posts'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first_page = self.get_page(url)
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.get_page(url, first_page.next_cursor)
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.id for post in first_page]
+                    + [post.id for post in second_page],
+                    expected
+                )
+                previous_page = self.get_page(
+                    url, second_page.previous_cursor
+                )
+                self.assertEqual(
+                    [post.id for post in previous_page],
+                    [post.id for post in first_page]
+                )
+
+    def test_cursor_page_is_stable_under_inserts(self):
+        url = reverse('posts:posts')
+        first_page = self.get_page(url)
+        Post.objects.create(author=self.auth, text='Новый пост')
+        second_page = self.get_page(url, first_page.next_cursor)
+        self.assertEqual(len(second_page), 3)
+        self.assertNotIn('Новый пост', [post.text for post in second_page])
+
+    def test_cursor_page_skips_count(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('posts:posts'), {'cursor': ''}
+            )
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in context.captured_queries)
+        )
+        self.assertContains(response, '?cursor=')
+
+    def test_broken_cursor_shows_first_page(self):
+        page = self.get_page(reverse('posts:posts'), 'not-a-cursor')
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_previous())
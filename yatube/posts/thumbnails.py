@@ -0,0 +1,96 @@
+"""Миниатюры картинок постов вне цикла запроса.
+
+Миниатюры создаются фоновой задачей (posts.tasks.process_image) после
+загрузки и нормализации картинки (posts.images). Шаблон только спрашивает у
+хранилища sorl, готова ли миниатюра, и до её появления выводит
+заглушку: Pillow в запросе пользователя не запускается никогда.
+
+Миниатюр несколько, по ширинам WIDTHS с одной пропорцией: шаблон
+выводит их в srcset, и телефон скачивает вариант под свой экран.
+Варианты шире DEFAULT_WIDTH создаются, только если оригинал не меньше.
+"""
+import logging
+
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching, shards
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960, 1920)
+# ширина варианта для src, его и ждёт шаблон вместо заглушки
+DEFAULT_WIDTH = 960
+ASPECT_RATIO = 960 / 339
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+def geometry(width):
+    return f'{width}x{round(width / ASPECT_RATIO)}'
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий найти готовую миниатюру, не создавая её."""
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        # те же опции, что добавляет ThumbnailBackend.get_thumbnail,
+        # иначе имя файла миниатюры не совпадёт
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = DeferredThumbnailBackend()
+
+
+def ready_thumbnail(image, width=DEFAULT_WIDTH):
+    """Готовая миниатюра картинки поста шириной width или None."""
+    if not image:
+        return None
+    return backend.get_ready_thumbnail(image, geometry(width), **OPTIONS)
+
+
+def ready_variants(image):
+    """Готовые миниатюры всех ширин: список пар (ширина, миниатюра)."""
+    if not image:
+        return []
+    variants = [(width, ready_thumbnail(image, width)) for width in WIDTHS]
+    return [(width, variant) for width, variant in variants if variant]
+
+
+def variant_widths(source_width):
+    """Ширины вариантов для оригинала шириной source_width: растягивать
+    его шире DEFAULT_WIDTH незачем."""
+    return [width for width in WIDTHS
+            if width <= max(source_width, DEFAULT_WIDTH)]
+
+
+def generate(name):
+    """Создаёт миниатюры всех ширин и сбрасывает кеш лент и карточек
+    с постами этой картинки."""
+    try:
+        source = ImageFile(name, default.storage)
+        source_width = default.engine.get_image_size(
+            default.engine.get_image(source))[0]
+        for width in variant_widths(source_width):
+            backend.get_thumbnail(name, geometry(width), **OPTIONS)
+        for posts in shards.each(Post.objects.filter(image=name)):
+            # карточка с заглушкой сменится на карточку с миниатюрой
+            posts.update(updated=timezone.now())
+            for post in posts.only('pk', 'author_id', 'group_id'):
+                caching.bump_post(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
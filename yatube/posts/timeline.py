@@ -0,0 +1,148 @@
+"""Лента подписок с разносом постов по подписчикам при записи.
+
+Пост автора с небольшим числом подписчиков сразу записывается в
+TimelineEntry каждого подписчика, и лента читается по одному индексу
+(user, pub_date). Посты авторов, у которых подписчиков больше
+TIMELINE_FANOUT_THRESHOLD, не разносятся: такие авторы подмешиваются
+в ленту при чтении. Когда после отписки автор опускается до порога,
+его посты разносятся по лентам всех подписчиков (backfill_followers):
+иначе посты, вышедшие без разноса, пропали бы из их лент.
+
+С шардами (posts.shards) посты не разносятся: TimelineEntry в основной
+базе не может ссылаться на пост из шарда. Лента тогда собирается при
+чтении из шардов всех авторов подписок.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from users.models import Profile
+
+from . import shards
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _followers_count(author_id):
+    return Profile.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first() or 0
+
+
+def is_fanned_out(author_id):
+    if shards.enabled():
+        return False
+    return _followers_count(author_id) <= settings.TIMELINE_FANOUT_THRESHOLD
+
+
+def dropped_to_threshold(author_id):
+    """Опустился ли автор после отписки до порога разноса."""
+    if shards.enabled():
+        return False
+    return _followers_count(author_id) == settings.TIMELINE_FANOUT_THRESHOLD
+
+
+def fan_out_post(post, batch_size=BATCH_SIZE):
+    """Записывает пост в ленты всех подписчиков автора."""
+    if not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    with transaction.atomic():
+        for user_ids in _batches(followers, batch_size):
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=user_id, post_id=post.pk,
+                               pub_date=post.pub_date)
+                 for user_id in user_ids],
+                ignore_conflicts=True,
+            )
+
+
+def backfill(user_id, author_id, batch_size=BATCH_SIZE):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date').iterator()
+    with transaction.atomic():
+        for batch in _batches(posts, batch_size):
+            TimelineEntry.objects.bulk_create(
+                [TimelineEntry(user_id=user_id, post_id=post_id,
+                               pub_date=pub_date)
+                 for post_id, pub_date in batch],
+                ignore_conflicts=True,
+            )
+
+
+def backfill_followers(author_id, batch_size=BATCH_SIZE):
+    """Добавляет посты автора в ленты всех его подписчиков. Возвращает
+    id подписчиков."""
+    if not is_fanned_out(author_id):
+        return []
+    followers = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    for user_id in followers:
+        backfill(user_id, author_id, batch_size)
+    return followers
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def pulled_authors(user_id):
+    """Авторы из подписок, чьи посты не разносятся и читаются напрямую."""
+    if shards.enabled():
+        return list(Follow.objects.filter(
+            user_id=user_id).values_list('author_id', flat=True))
+    return list(Profile.objects.filter(
+        user__following__user_id=user_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD,
+    ).values_list('user_id', flat=True))
+
+
+def get_feed(user, pulled=None):
+    """Queryset постов ленты подписок пользователя. pulled — уже
+    вычисленный pulled_authors(user.pk)."""
+    posts = Post.objects.feed()
+    if pulled is None:
+        pulled = pulled_authors(user.pk)
+    if shards.enabled():
+        return shards.for_authors(posts, pulled)
+    if not pulled:
+        # сортировка по дате из самой ленты идёт по индексу
+        # (user, pub_date) без сортировки во временном B-дереве
+        return posts.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date'
+        )
+    timeline = TimelineEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(Q(pk__in=timeline) | Q(author_id__in=pulled))
+
+
+def rebuild(user_ids, batch_size=BATCH_SIZE):
+    """Пересобирает ленты заданных пользователей с нуля."""
+    for user_id in user_ids:
+        with transaction.atomic():
+            TimelineEntry.objects.filter(user_id=user_id).delete()
+            authors = Follow.objects.filter(
+                user_id=user_id
+            ).values_list('author_id', flat=True)
+            for author_id in authors:
+                backfill(user_id, author_id, batch_size)
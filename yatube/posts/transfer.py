@@ -0,0 +1,216 @@
+"""Потоковый импорт и экспорт постов (JSON Lines и CSV).
+
+Записи читаются и пишутся по одной, в память попадает только текущая
+пачка, поэтому размер файла не ограничен памятью. Пачки вставляются
+в отдельных транзакциях (insert_posts); авторы и группы ищутся по
+словарям, которые пополняются одним запросом на пачку. Вставка не
+вызывает сигналов, поэтому после импорта счётчики, ленты подписок
+и версии кеша обновляются отдельно (finish_import). С шардами
+(posts.shards) ключи постов берутся из общей последовательности, и
+каждый пост вставляется в шард своего автора.
+"""
+import csv
+import json
+from collections import defaultdict
+from itertools import chain, islice
+
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.db import atomic_writes
+
+from . import caching, counters, shards, timeline
+from .models import Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+FIELDS = ('text', 'author', 'group', 'pub_date', 'image')
+
+
+class RecordError(ValueError):
+    pass
+
+
+def detect_format(path, default='jsonl'):
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return default
+
+
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_records(stream, fmt, records):
+    """Пишет записи в stream, отдавая каждую записанную дальше."""
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, FIELDS)
+        writer.writeheader()
+    for record in records:
+        if writer:
+            writer.writerow(record)
+        else:
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        yield record
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def export_records(queryset, batch_size):
+    """Записи постов по возрастанию pk, пачками по keyset на pk.
+    queryset — с select_related('author', 'group'), в том числе
+    собранный из шардов (shards.merged)."""
+    last_pk = 0
+    while True:
+        posts = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not posts:
+            return
+        for post in posts:
+            yield {
+                'text': post.text,
+                'author': post.author.username,
+                'group': post.group.slug if post.group_id else '',
+                'pub_date': post.pub_date.isoformat(),
+                'image': post.image.name,
+            }
+        last_pk = posts[-1].pk
+
+
+def insert_posts(posts):
+    """Вставляет посты, как bulk_create, но без pre_save полей (raw, как
+    при загрузке фикстур): auto_now_add не заменяет дату публикации из
+    файла текущим временем. С шардами — в шард автора каждого поста."""
+    if not posts:
+        return
+    fields = Post._meta.concrete_fields
+    if shards.enabled():
+        # ключи общие для всех шардов: вставка без них заняла бы в
+        # каждом шарде одни и те же id
+        for post, pk in zip(posts, shards.allocate_ids(Post, len(posts))):
+            post.pk = pk
+    else:
+        fields = [field for field in fields if not field.primary_key]
+    by_db = defaultdict(list)
+    for post in posts:
+        by_db[router.db_for_write(Post, instance=post)].append(post)
+    for db, db_posts in by_db.items():
+        size = connections[db].ops.bulk_batch_size(fields, db_posts)
+        for batch in batches(db_posts, size):
+            Post.objects.using(db)._insert(
+                batch, fields=fields, using=db, raw=True)
+
+
+class Importer:
+    """Вставляет записи пачками и запоминает затронутых авторов и группы
+    для finish_import."""
+
+    def __init__(self, create_authors=False, create_groups=False):
+        self.create_authors = create_authors
+        self.create_groups = create_groups
+        self.authors = {}
+        self.groups = {}
+        self.author_ids = set()
+        self.group_ids = set()
+        self.imported = 0
+        self.errors = []
+
+    def resolve(self, batch):
+        """Пополняет словари авторов и групп для пачки записей."""
+        usernames = {record.get('author') for record in batch} - set(
+            self.authors)
+        usernames.discard(None)
+        self.authors.update(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        if self.create_authors:
+            for username in usernames - set(self.authors):
+                user = User(username=username)
+                user.set_unusable_password()
+                user.save()
+                self.authors[username] = user.pk
+        slugs = {record.get('group') for record in batch} - set(self.groups)
+        slugs.discard(None)
+        slugs.discard('')
+        self.groups.update(Group.objects.filter(
+            slug__in=slugs).values_list('slug', 'pk'))
+        if self.create_groups:
+            for slug in slugs - set(self.groups):
+                self.groups[slug] = Group.objects.create(
+                    title=slug, slug=slug, description='').pk
+
+    def build(self, record):
+        text = record.get('text')
+        if not text:
+            raise RecordError('нет текста')
+        author_id = self.authors.get(record.get('author'))
+        if author_id is None:
+            raise RecordError(f'нет автора {record.get("author")!r}')
+        group_id = None
+        if record.get('group'):
+            group_id = self.groups.get(record['group'])
+            if group_id is None:
+                raise RecordError(f'нет группы {record["group"]!r}')
+        post = Post(
+            text=text,
+            author_id=author_id,
+            group_id=group_id,
+            image=record.get('image') or '',
+        )
+        post.pub_date = post.updated = timezone.now()
+        if record.get('pub_date'):
+            post.pub_date = parse_datetime(record['pub_date'])
+            if post.pub_date is None:
+                raise RecordError(f'неверная дата {record["pub_date"]!r}')
+        return post
+
+    def import_batch(self, batch, line):
+        """Вставляет пачку; line — номер первой записи пачки."""
+        self.resolve(batch)
+        posts = []
+        for number, record in enumerate(batch, line):
+            try:
+                posts.append(self.build(record))
+            except RecordError as error:
+                self.errors.append((number, str(error)))
+        with atomic_writes():
+            insert_posts(posts)
+        self.author_ids.update(post.author_id for post in posts)
+        self.group_ids.update(post.group_id for post in posts)
+        self.imported += len(posts)
+
+
+def finish_import(author_ids, group_ids, batch_size=timeline.BATCH_SIZE):
+    """То, что при обычном сохранении делают сигналы: счётчики постов,
+    ленты подписчиков и версии кеша лент."""
+    author_ids = sorted(author_ids)
+    for ids in batches(author_ids, batch_size):
+        counters.reconcile_profiles(ids)
+    follows = Follow.objects.filter(
+        author_id__in=author_ids).values_list('user_id', 'author_id')
+    follower_ids = set()
+    for user_id, author_id in follows.iterator():
+        timeline.backfill(user_id, author_id, batch_size)
+        follower_ids.add(user_id)
+    scopes = chain(
+        ['posts'],
+        (f'author:{author_id}' for author_id in author_ids),
+        (f'group:{group_id}' for group_id in group_ids if group_id),
+        (f'follow:{user_id}' for user_id in follower_ids),
+    )
+    for batch in batches(scopes, caching.BUMP_BATCH_SIZE):
+        caching.bump(*batch)
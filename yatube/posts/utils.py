@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.urls import reverse
+
+from core.paginator import CountedPaginator, CursorPaginator
+
+from . import search, shards
+from .forms import SearchForm
+from .models import User
+
+POSTS_PER_PAGE = 10
+
+
+def absolute_url(viewname, **kwargs):
+    """Полная ссылка на страницу сайта (SITE_URL) для писем."""
+    return settings.SITE_URL.rstrip('/') + reverse(viewname, kwargs=kwargs)
+
+
+def get_page_obj(request, post_list, per_page=POSTS_PER_PAGE, count=None):
+    """Страница ленты. По умолчанию — обычная постраничная навигация,
+    с параметром ?cursor= — курсорная по (pub_date, id) без COUNT(*).
+    Уже известное число постов (count) избавляет и от COUNT(*)."""
+    if 'cursor' in request.GET:
+        paginator = CursorPaginator(post_list, per_page)
+        return paginator.get_page(request.GET.get('cursor'))
+    if count is None:
+        paginator = Paginator(post_list, per_page)
+    else:
+        paginator = CountedPaginator(post_list, per_page, count)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def get_search_page(request, per_page=POSTS_PER_PAGE):
+    """Форма поиска и страница результатов. Пагинация всегда курсорная
+    по (rank, id): COUNT(*) по совпадениям FTS не нужен."""
+    form = SearchForm(request.GET or None)
+    post_list = search.search(None)
+    if form.is_valid():
+        post_list = search.search(form.cleaned_data['q'])
+        if form.cleaned_data['group']:
+            post_list = post_list.filter(group=form.cleaned_data['group'])
+        if form.cleaned_data['author'] and shards.enabled():
+            # в шардах нет пользователей: JOIN по username там пуст
+            post_list = shards.for_authors(post_list, list(
+                User.objects.filter(username=form.cleaned_data['author'])
+                .values_list('pk', flat=True)))
+        elif form.cleaned_data['author']:
+            post_list = post_list.filter(
+                author__username=form.cleaned_data['author'])
+    paginator = CursorPaginator(
+        shards.merged(post_list), per_page, search.ORDERING)
+    return form, paginator.get_page(request.GET.get('cursor'))
+
+
+def get_comments_page(request, post):
+    """Порция комментариев поста по курсору (created, id): начало
+    обсуждения выводится сразу, остальное подгружается по запросу."""
+    comments = shards.merged(post.comments.select_related('author').only(
+        'text', 'created', 'post_id', 'author__username'), [post._state.db])
+    paginator = CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ('created', 'id'))
+    return paginator.get_page(request.GET.get('cursor'))
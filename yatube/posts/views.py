@@ -1,46 +1,75 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.urls import reverse
 
+from core import replicas
+from core.db import retry_on_locked
+
+from . import caching, counters, search, shards, tasks, timeline
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .utils import get_comments_page, get_page_obj, get_search_page
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('pk', flat=True).first()
+    return group_id and [f'group:{group_id}']
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    # кнопка «Подписаться/Отписаться» зависит от подписок зрителя
+    return [f'author:{author_id}', f'follow:{request.user.pk}']
+
 
+def post_scopes(request, post_id):
+    # на странице поста есть и число постов автора
+    post = shards.find(Post.objects.only('author_id'), pk=post_id)
+    return post and [f'post:{post_id}', f'author:{post.author_id}']
 
-@cache_page(20)
+
+@replicas.read_only
+@caching.conditional_page(lambda request: ['posts'])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = shards.merged(Post.objects.feed())
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
         'post_list': post_list,
+        **caching.feed_context('posts'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@replicas.read_only
+@caching.conditional_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = shards.merged(group.posts.feed())
+    page_obj = get_page_obj(request, post_list)
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
+        **caching.feed_context(f'group:{group.pk}'),
     }
     return render(request, template, context)
 
 
+@replicas.read_only
+@caching.conditional_page(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author)
-    post_counter = post_list.count()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username
+    )
+    post_list = shards.for_authors(Post.objects.feed(), [author.pk])
+    post_counter = counters.get_profile(author).posts_count
+    page_obj = get_page_obj(request, post_list, count=post_counter)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author,
@@ -49,29 +78,36 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'post_counter': post_counter,
-        'following': following
+        'following': following,
+        **caching.feed_context(f'author:{author.pk}'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@replicas.read_only
+@caching.conditional_page(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = shards.get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'),
+        id=post_id,
+    )
     author = post.author
-    post_list = author.posts.all()
-    post_counter = post_list.count()
+    post_counter = counters.get_profile(author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comments_page(request, post)
     context = {
         'post': post,
         'author': post.author,
         'post_counter': post_counter,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        **caching.feed_context(f'post:{post.pk}'),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
 @login_required
+@retry_on_locked
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -81,13 +117,15 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        tasks.schedule_image(post)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
 
 @login_required
+@retry_on_locked
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = shards.get_object_or_404(Post.objects.all(), pk=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post.pk)
     form = PostForm(
@@ -97,6 +135,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            tasks.schedule_image(post)
         return redirect('posts:post_detail', post_id=post.pk)
     context = {
         'form': form,
@@ -106,9 +146,28 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста для подгрузки на странице."""
+    post = shards.get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page_obj = get_comments_page(request, post)
+    results = [{
+        'id': comment.pk,
+        'author': comment.author.username,
+        'author_url': reverse(
+            'posts:profile', kwargs={'username': comment.author.username}),
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    } for comment in page_obj]
+    return JsonResponse({
+        'results': results,
+        'next': page_obj.next_cursor,
+    })
+
+
 @login_required
+@retry_on_locked
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = shards.get_object_or_404(Post.objects.all(), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -118,14 +177,19 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@replicas.read_only
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user).order_by('-pub_date')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    contex = {'page_obj': page_obj}
+    pulled = timeline.pulled_authors(request.user.pk)
+    post_list = timeline.get_feed(request.user, pulled)
+    page_obj = get_page_obj(request, post_list)
+    contex = {
+        'page_obj': page_obj,
+        **caching.feed_context(
+            f'follow:{request.user.pk}',
+            *(f'author:{author_id}' for author_id in pulled)
+        ),
+    }
     return render(
         request,
         'posts/follow.html',
@@ -134,6 +198,7 @@ def follow_index(request):
 
 
 @login_required
+@retry_on_locked
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
@@ -142,6 +207,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@retry_on_locked
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
@@ -149,9 +215,43 @@ def profile_unfollow(request, username):
 
 
 @login_required
+@retry_on_locked
 def post_delete(request, username, post_id):
     if request.user.username != username:
         return redirect(f"/{username}/{post_id}")
-    post = get_object_or_404(Post, pk=post_id)
+    post = shards.get_object_or_404(Post.objects.all(), pk=post_id)
     post.delete()
     return redirect('posts:profile', username=username)
+
+
+def post_search(request):
+    form, page_obj = get_search_page(request)
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+        'query_string': query.urlencode(),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_search_api(request):
+    form, page_obj = get_search_page(request)
+    if form.errors:
+        return JsonResponse({'errors': form.errors}, status=400)
+    results = [{
+        'id': post.pk,
+        'url': request.build_absolute_uri(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})),
+        'snippet': search.highlight(post.snippet),
+        'rank': post.rank,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'pub_date': post.pub_date.isoformat(),
+    } for post in page_obj]
+    return JsonResponse({
+        'results': results,
+        'next': page_obj.next_cursor,
+        'previous': page_obj.previous_cursor,
+    })
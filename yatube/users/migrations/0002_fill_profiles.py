@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_profiles(apps, schema_editor):
+    app_label, model_name = settings.AUTH_USER_MODEL.split('.')
+    User = apps.get_model(app_label, model_name)
+    Profile = apps.get_model('users', 'Profile')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+
+    def counts(queryset, field):
+        return dict(queryset.values(field).annotate(
+            count=Count('pk')).values_list(field, 'count'))
+
+    posts = counts(Post.objects.all(), 'author_id')
+    followers = counts(Follow.objects.all(), 'author_id')
+    following = counts(Follow.objects.all(), 'user_id')
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id,
+                 posts_count=posts.get(user_id, 0),
+                 followers_count=followers.get(user_id, 0),
+                 following_count=following.get(user_id, 0))
+         for user_id in User.objects.values_list('pk', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('posts', '0009_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_fill_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='last_digest_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний дайджест'),
+        ),
+    ]
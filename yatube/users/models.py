@@ -1,3 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.db import models
 
+User = get_user_model()
 
-# Create your models here.
+
+class Profile(models.Model):
+    """Профиль автора: счётчики, которые иначе пришлось бы считать
+    COUNT(*) на каждой странице. Обновляются сигналами posts
+    атомарными F-выражениями, расхождения чинит reconcile_counters."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # до этого момента посты подписок уже разосланы в дайджесте
+    last_digest_at = models.DateTimeField(
+        'Последний дайджест', null=True, blank=True)
+
+    def __str__(self):
+        return str(self.user)
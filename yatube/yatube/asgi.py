@@ -0,0 +1,17 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 не умеет ASGI сам, запросы выполняет WSGI-приложение
+в пуле потоков (см. core.asgi).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+from core.asgi import ASGIHandler  # noqa: E402
+
+application = ASGIHandler(get_wsgi_application())
@@ -0,0 +1,41 @@
+"""Настройки выбираются переменной окружения DJANGO_ENV.
+
+    dev  — DEBUG, debug_toolbar, раздача media Django;
+    test — для manage.py test и pytest: быстрые хеши паролей;
+    prod — кешированный загрузчик шаблонов, хешированная статика,
+           никакой раздачи статики и media из Python.
+
+Значения по умолчанию нет: забытая переменная на сервере иначе включила
+бы DEBUG. manage.py сам выбирает dev (test для manage.py test).
+
+Профиль можно указать и напрямую:
+DJANGO_SETTINGS_MODULE=yatube.settings.prod.
+"""
+import os
+from importlib import import_module
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('dev', 'test', 'prod')
+
+DJANGO_ENV = os.environ.get('DJANGO_ENV')
+_module = os.environ.get('DJANGO_SETTINGS_MODULE', '')
+if DJANGO_ENV is None and _module.startswith(f'{__name__}.'):
+    # профиль задан напрямую (pytest.ini): пакет импортируется по пути
+    DJANGO_ENV = _module[len(__name__) + 1:]
+if DJANGO_ENV is None:
+    raise ImproperlyConfigured(
+        f'Не задана переменная DJANGO_ENV, допустимые значения: '
+        f'{", ".join(PROFILES)}'
+    )
+if DJANGO_ENV not in PROFILES:
+    raise ImproperlyConfigured(
+        f'DJANGO_ENV={DJANGO_ENV!r}, допустимые значения: '
+        f'{", ".join(PROFILES)}'
+    )
+
+globals().update({
+    name: value
+    for name, value in vars(import_module(f'{__name__}.{DJANGO_ENV}')).items()
+    if name.isupper()
+})
@@ -0,0 +1,265 @@
+"""
+Django settings for yatube project: общие для всех профилей.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+Профили dev, test и prod (см. yatube/settings/__init__.py) дополняют
+и переопределяют эти настройки.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))))
+
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'x$e1!l3g&0anahf2zzuhbhe*e0n6h=13$s(q16ttzmynp1m1q&'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    '127.0.0.1:8000',
+    'www.belinskii1.pythonanywhere.com',
+    'belinskii1.pythonanywhere.com',
+]
+
+# Application definition
+
+INSTALLED_APPS = [
+    'posts.apps.PostsConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'core.replicas.ReplicaMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'core.template_backend.InstrumentedDjangoTemplates',
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+# Под ASGI-сервером (yatube.asgi) представления выполняются в пуле
+# из стольких потоков; соединения в keep-alive потоков не занимают.
+ASGI_THREADS = 16
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # соединение переживает запрос: не открывать файл и не
+        # выполнять прагмы (см. core.db) на каждый запрос
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # сколько писатель ждёт освобождения базы, секунд
+            'timeout': 20,
+        },
+    }
+}
+
+# Реплики только для чтения (core.replicas): алиасы из DATABASES, из
+# которых читают представления с @read_only. После записи сессия
+# столько секунд читает из основной базы.
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 10
+
+# Шарды постов и комментариев (posts.shards): алиасы из DATABASES.
+# Пусто — все посты в default. После изменения списка посты переносит
+# manage.py rebalance_shards.
+POST_SHARDS = []
+
+DATABASE_ROUTERS = ['posts.shards.ShardRouter', 'core.replicas.ReplicaRouter']
+
+# Транзакции, получившие «database is locked», повторяются
+# (core.db.retry_on_locked): число попыток и начальная пауза, секунд.
+SQLITE_LOCK_RETRIES = 5
+SQLITE_LOCK_RETRY_DELAY = 0.05
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+
+# Django должен знать, откуда подгружать статические файлы:
+# в большом проекте может быть несколько директорий со статикой;
+# некоторые из этих директорий могут храниться даже на других серверах.
+# Адреса этих директорий указываются в файле settings.py, списком или кортежем в константе STATICFILES_DIRS
+STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+# сюда collectstatic собирает статику для раздачи веб-сервером
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:posts'
+LOGOUT_REDIRECT_URL = None
+
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Адрес сайта для ссылок в письмах: запроса, из которого его можно
+# взять, у фоновых рассылок нет.
+SITE_URL = 'http://127.0.0.1:8000'
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Кеш общий для всех процессов сервера: файл SQLite, перед которым в
+# каждом процессе стоит небольшой LRU (см. core.cache). Пространства
+# имён в одном файле разделяются KEY_PREFIX.
+CACHE_DB = os.path.join(BASE_DIR, 'cache.sqlite3')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': CACHE_DB,
+        'KEY_PREFIX': 'default',
+        'OPTIONS': {
+            'SHARED_BACKEND': 'core.cache.SQLiteCache',
+            'MAX_ENTRIES': 100000,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+        },
+    },
+    # версии лент читаются мимо L1: сброс должен быть виден сразу
+    'feed_versions': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_DB,
+        'KEY_PREFIX': 'feed-versions',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Посты авторов, у которых подписчиков больше порога, не разносятся
+# по лентам подписчиков при публикации, а подмешиваются при чтении.
+TIMELINE_FANOUT_THRESHOLD = 1000
+
+# Фрагменты лент кешируются надолго: при изменении содержимого ленты
+# сигналы меняют версию её ключей (см. posts.caching).
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Загруженные картинки фоновая задача приводит к этим размерам и
+# формату (posts.images): WEBP или JPEG (прогрессивный), качество 1–100.
+IMAGE_MAX_SIZE = (1920, 1920)
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 80
+
+# Комментарии на странице поста выводятся порциями: столько сразу,
+# следующие подгружаются с posts:post_comments.
+COMMENTS_PER_PAGE = 50
+
+# Метрики запросов (core.metrics): доступ к /metrics/ и порог, после
+# которого запрос пишется в журнал yatube.slow_requests вместе с самыми
+# долгими SQL-запросами. С METRICS_TOKEN эндпоинт отдаётся только по
+# заголовку «Authorization: Bearer <токен>»; без него — прямым запросам
+# с адресов METRICS_ALLOWED_IPS, но не через прокси (за nginx
+# REMOTE_ADDR всегда адрес самого прокси).
+METRICS_TOKEN = ''
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+SLOW_REQUEST_THRESHOLD = 0.5
+SLOW_REQUEST_MAX_STATEMENTS = 10
+
+# Очередь фоновых задач (core.jobs): повторы упавших задач с паузой
+# JOBS_RETRY_DELAY * 2^(попытка-1) секунд, задача, взятая воркером
+# дольше JOBS_LOCK_TIMEOUT секунд назад, считается брошенной. При
+# JOBS_EAGER задачи выполняются сразу, без воркеров.
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_LOCK_TIMEOUT = 10 * 60
+JOBS_POLL_INTERVAL = 1
+
+# Дайджест новых постов подписок (posts.digests, send_digests по
+# расписанию): период в секундах, подписчиков за пачку, постов в письме.
+DIGEST_PERIOD = 24 * 60 * 60
+DIGEST_BATCH_SIZE = 500
+DIGEST_MAX_POSTS = 10
@@ -0,0 +1,51 @@
+"""Профиль разработки: отладка и debug_toolbar."""
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, DATABASES, INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = True
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+    '127.0.0.1:8000',
+]
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+# задачи очереди выполняются прямо в запросе, как без неё; чтобы
+# проверить фоновую обработку, выключите и запустите run_workers
+JOBS_EAGER = True
+
+# DJANGO_REPLICA=1: ленты и страницы постов читаются из копии базы
+# db.replica.sqlite3, её обновляет manage.py sync_replicas --interval 1
+if os.environ.get('DJANGO_REPLICA'):
+    DATABASES = {
+        **DATABASES,
+        'replica': {
+            **DATABASES['default'],
+            'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        },
+    }
+    DATABASE_REPLICAS = ['replica']
+
+# DJANGO_SHARDS=3: посты делятся между default и db.shard1.sqlite3,
+# db.shard2.sqlite3; каждую базу нужно создать: migrate --database=shardN
+SHARD_COUNT = int(os.environ.get('DJANGO_SHARDS') or 1)
+if SHARD_COUNT > 1:
+    DATABASES = {
+        **DATABASES,
+        **{
+            f'shard{number}': {
+                **DATABASES['default'],
+                'NAME': os.path.join(BASE_DIR, f'db.shard{number}.sqlite3'),
+            }
+            for number in range(1, SHARD_COUNT)
+        },
+    }
+    POST_SHARDS = ['default'] + [
+        f'shard{number}' for number in range(1, SHARD_COUNT)]
@@ -0,0 +1,57 @@
+"""Боевой профиль.
+
+Шаблоны компилируются один раз на процесс (cached.Loader), статика
+собирается collectstatic в STATIC_ROOT с хешем содержимого в именах
+файлов, поэтому веб-сервер может отдавать её с кешированием «навсегда»:
+
+    location /static/ {
+        alias <STATIC_ROOT>/;
+        expires max;
+        add_header Cache-Control "public, immutable";
+    }
+    location /media/ { alias <MEDIA_ROOT>/; }
+
+Django не раздаёт ни статику, ни media.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import STATIC_ROOT, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Задайте DJANGO_SECRET_KEY')
+
+# за прокси адрес клиента не виден: /metrics/ — только по токену
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN', '')
+
+SITE_URL = os.environ.get(
+    'DJANGO_SITE_URL', 'https://belinskii1.pythonanywhere.com')
+
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', STATIC_ROOT)
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.ManifestStaticFilesStorage')
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    # с явными загрузчиками APP_DIRS должен быть выключен
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor
+            for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.template.context_processors.debug'
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
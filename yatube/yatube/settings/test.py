@@ -0,0 +1,34 @@
+"""Профиль тестов: без debug_toolbar, с быстрым хешем паролей."""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .base import *  # noqa: F401,F403
+from .base import CACHES, DATABASES
+
+# тесты создают много пользователей, PBKDF2 здесь только тормозит
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# свой файл кеша на прогон: общий cache.sqlite3 переносил бы версии лент
+# и фрагменты между прогонами и в кеш разработки
+CACHE_DIR = tempfile.mkdtemp(prefix='yatube-cache-')
+atexit.register(shutil.rmtree, CACHE_DIR, ignore_errors=True)
+CACHE_DB = os.path.join(CACHE_DIR, 'cache.sqlite3')
+CACHES = {
+    alias: {**config, 'LOCATION': CACHE_DB}
+    for alias, config in CACHES.items()
+}
+
+# задачи выполняются сразу: тесты видят их результат без воркеров
+JOBS_EAGER = True
+
+# реплика для тестов core.replicas: в тестах это та же база; шард для
+# тестов posts.shards — отдельная
+DATABASES = {
+    **DATABASES,
+    'replica': {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}},
+    'shard1': {**DATABASES['default']},
+}
@@ -18,12 +18,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core import views as core_views
+
 urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/', core_views.metrics, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -31,8 +35,10 @@ handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
 if settings.DEBUG:
-    import debug_toolbar
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)